@@ -0,0 +1,106 @@
+"""Record of which batch outputs are current, so re-runs only redo what changed.
+
+The manifest lives in the output directory as JSON lines, one record per
+output written: the input it came from (size, mtime and content digest) and
+the recipe that produced it. A record is appended as soon as its output is
+saved, so an interrupted run resumes where it stopped. An input counts as
+unchanged if its size and mtime match; if only the mtime moved, its content
+digest decides.
+"""
+import os
+import json
+import hashlib
+from threading import Lock
+
+MANIFEST_NAME = '.filtrawy_manifest.jsonl'
+
+
+def file_digest(data):
+    """Content digest of a file's bytes"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_digest(path):
+    with open(path, 'rb') as f:
+        return file_digest(f.read())
+
+
+class BatchManifest:
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.output_dir = output_dir
+        self.records = {}
+        self._lock = Lock()
+        self._file = None
+        self.load()
+
+    def load(self):
+        """Read the records, later lines overriding earlier ones"""
+        self.records = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                self.records[record['output']] = record
+
+    def _name(self, output_path):
+        return os.path.relpath(output_path, self.output_dir)
+
+    def is_current(self, job, output_path, recipe):
+        """True if output_path exists and was made from job's input, as it is now, by recipe
+
+        Stats the input (once per job) and stores size and mtime on the job for record().
+        """
+        if job.size is None:
+            try:
+                stat = os.stat(job.input_path)
+            except OSError:
+                return False
+            job.size, job.mtime_ns = stat.st_size, stat.st_mtime_ns
+
+        record = self.records.get(self._name(output_path))
+        if (record is None or record['recipe'] != recipe
+                or record['input'] != os.path.abspath(job.input_path)
+                or record['size'] != job.size or not os.path.exists(output_path)):
+            return False
+        if record['mtime_ns'] == job.mtime_ns:
+            return True
+
+        # Touched but maybe not changed: compare contents
+        if job.digest is None:
+            job.digest = read_digest(job.input_path)
+        if job.digest != record['digest']:
+            return False
+        self.record(job, output_path, recipe)
+        return True
+
+    def record(self, job, output_path, recipe):
+        """Note that output_path is now current for job's input; written through immediately"""
+        record = {'output': self._name(output_path),
+                  'input': os.path.abspath(job.input_path),
+                  'size': job.size, 'mtime_ns': job.mtime_ns,
+                  'digest': job.digest, 'recipe': recipe}
+        with self._lock:
+            self.records[record['output']] = record
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def close(self):
+        """Rewrite the manifest with one line per output, dropping superseded records"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record) + '\n')
+            os.replace(temp_path, self.path)
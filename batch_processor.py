@@ -1,108 +1,764 @@
 import os
+import json
+import time
+import fnmatch
+import traceback
 import cv2
 import numpy as np
-from threading import Thread
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Thread, Event, Lock
 from queue import Queue
-from advanced_filters import AdvancedFilters
+from filter_pipeline import Pipeline, PlanTree, FILTER_REGISTRY
+from batch_manifest import BatchManifest, file_digest
+from buffer_pool import BufferPool
+
+# Files picked up by default (matched case-insensitively)
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp', '*.gif')
+
+
+def _matches(relative_path, patterns):
+    """True if any pattern matches the path relative to the input root, or its last component"""
+    relative_path = relative_path.lower()
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatchcase(relative_path, pattern) or fnmatch.fnmatchcase(name, pattern)
+               for pattern in patterns)
+
+
+def discover_images(root, include=IMAGE_PATTERNS, exclude=(), recursive=False, skip_dirs=()):
+    """Yield the paths of matching files under root, relative to it, as they are found
+    
+    Paths use '/' separators. Directories are walked with os.scandir one at
+    a time, so memory stays flat however many files there are. An excluded
+    directory is not entered at all, and neither is anything in skip_dirs
+    (real paths), such as an output directory inside the input tree.
+    Symlinked directories are not followed.
+    """
+    include = [pattern.lower() for pattern in include]
+    exclude = [pattern.lower() for pattern in exclude]
+    skip_dirs = {os.path.realpath(path) for path in skip_dirs}
+    
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, relative_dir))
+        except OSError as e:
+            print(f"Cannot read directory {relative_dir or root}: {str(e)}")
+            continue
+        
+        subdirs = []
+        with entries:
+            for entry in entries:
+                relative_path = relative_dir + '/' + entry.name if relative_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                if exclude and _matches(relative_path, exclude):
+                    continue
+                if is_dir:
+                    if recursive and os.path.realpath(entry.path) not in skip_dirs:
+                        subdirs.append(relative_path)
+                elif is_file and _matches(relative_path, include):
+                    yield relative_path
+        
+        # Visit subdirectories in listing order
+        pending.extend(reversed(subdirs))
+
+
+def write_output(path, image):
+    """cv2.imwrite, creating the output's directory first"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return cv2.imwrite(path, image)
+
+
+class SharedFrame:
+    """uint8 frame backed by a multiprocessing.shared_memory block"""
+    def __init__(self, block, shape, owner):
+        self.block = block
+        self.shape = tuple(shape)
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=block.buf)
+    
+    @property
+    def name(self):
+        return self.block.name
+    
+    @classmethod
+    def create(cls, shape):
+        size = int(np.prod(shape))
+        return cls(shared_memory.SharedMemory(create=True, size=max(size, 1)), shape, True)
+    
+    @classmethod
+    def attach(cls, name, shape):
+        # Pool workers share the creator's resource tracker, so attaching is safe
+        return cls(shared_memory.SharedMemory(name=name), shape, False)
+    
+    def release(self):
+        """Drop this process's view; the creator also frees the block"""
+        self.array = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+# Plans compiled once per worker process by _init_worker
+_worker_tree = None
+_worker_buffers = None
+
+
+def _init_worker(target_keys):
+    """target_keys maps each target name to its Pipeline.key()"""
+    global _worker_tree, _worker_buffers
+    # One OpenCV thread per process; the pool already uses every core
+    cv2.setNumThreads(1)
+    _worker_tree = PlanTree({name: Pipeline.from_key(key).compile()
+                             for name, key in target_keys.items()})
+    _worker_buffers = BufferPool()
+
+
+def _filter_shared(source_name, result_names, shape):
+    """Worker process: filter the frame in one shared block into one block per target
+    
+    result_names maps target names to the blocks their results go in.
+    """
+    source = SharedFrame.attach(source_name, shape)
+    results = {name: SharedFrame.attach(block, shape) for name, block in result_names.items()}
+    try:
+        for name, image in _worker_tree.run(source.array, results, buffers=_worker_buffers).items():
+            results[name].array[...] = image
+    finally:
+        source.release()
+        for result in results.values():
+            result.release()
+
+
+class CancelToken:
+    """Flag shared between a batch run and whoever wants to stop it"""
+    def __init__(self):
+        self._event = Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class BatchResult:
+    """Outcome of one file, plus the progress of the whole run when it finished"""
+    def __init__(self, job, done, total, processed, elapsed, cancel_token):
+        self.input_path = job.input_path
+        self.output_path = job.output_path
+        # {target name: output path}, one per preset in a fan-out run
+        self.outputs = job.outputs
+        self.ok = job.ok
+        # Seconds spent per step for this file: 'read', 'filter', 'write'
+        self.timings = job.timings
+        # True if the output was already current and the file was not processed
+        self.skipped = job.skipped
+        self.done = done
+        # None while files are still being discovered
+        self.total = total
+        # Files actually processed so far, not counting skipped ones
+        self.processed = processed
+        # Seconds since the run started
+        self.elapsed = elapsed
+        self.cancel_token = cancel_token
+    
+    @property
+    def seconds(self):
+        return sum(self.timings.values())
+    
+    @property
+    def eta(self):
+        """Estimated seconds until the run finishes"""
+        if self.processed == 0 or self.total is None:
+            return None
+        return self.elapsed / self.processed * (self.total - self.done)
+
+
+class BatchJob:
+    """One file travelling through the stages of a batch run"""
+    def __init__(self, input_path, outputs):
+        self.input_path = input_path
+        # {target name: output path}
+        self.outputs = outputs
+        # Targets whose outputs still have to be made
+        self.pending = list(outputs)
+        self.timings = {}
+        # Decoded RGB frame; None if reading failed
+        self.image = None
+        # {target name: filtered BGR frame}, then {target name: written ok}
+        self.results = {}
+        self.written = {}
+        self.ok = False
+        # Input size, mtime and content digest, for the manifest
+        self.size = None
+        self.mtime_ns = None
+        self.digest = None
+    
+    @property
+    def output_path(self):
+        """The output of the first target"""
+        return next(iter(self.outputs.values()))
+    
+    @property
+    def skipped(self):
+        """True if every output was already current; such jobs pass through untouched"""
+        return not self.pending
+    
+    def fail(self):
+        """Mark the job failed and drop its frames; later stages pass it through"""
+        self.image = None
+        self.results = {}
+        self.ok = False
+    
+    def read(self):
+        """Read and decode the input as BGR, noting its content digest; None on failure"""
+        try:
+            with open(self.input_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self.digest = file_digest(data)
+        if not data:
+            # imdecode asserts on an empty buffer, where imread returned None
+            return None
+        try:
+            return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error:
+            return None
+
+
+class BatchStage:
+    """A pool of threads applying one step to the items in an inbox queue
+    
+    step(item) returns what to put in the outbox, or None to drop the item.
+    If it raises, the job is marked failed (BatchJob.fail) and passed on.
+    A None in the inbox tells one thread to stop; once all of them have
+    stopped, the stage puts one None per downstream thread in its outbox.
+    Bounded queues on either side give backpressure: a stage blocks while
+    the next one is behind.
+    """
+    def __init__(self, name, step, workers, inbox, outbox, downstream=1):
+        self.name = name
+        self.step = step
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream = downstream
+        # Totals across the stage's threads
+        self.items = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.started = None
+        self.stopped = None
+        self._running = workers
+        self._lock = Lock()
+        self._threads = []
+    
+    def start(self):
+        self.started = time.perf_counter()
+        for _ in range(self.workers):
+            t = Thread(target=self._run, daemon=True)
+            t.start()
+            self._threads.append(t)
+    
+    def join(self):
+        for t in self._threads:
+            t.join()
+    
+    def _run(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is None:
+                    break
+                
+                start = time.perf_counter()
+                try:
+                    item = self.step(item)
+                except Exception as e:
+                    print(f"Error in {self.name} stage for {item.input_path}: {str(e)}")
+                    traceback.print_exc()
+                    # Still pass the job on, so it is reported and the run can finish
+                    item.fail()
+                busy = time.perf_counter() - start
+                
+                # Time spent waiting for room downstream is backpressure, not work
+                start = time.perf_counter()
+                if item is not None:
+                    self.outbox.put(item)
+                blocked = time.perf_counter() - start
+                
+                with self._lock:
+                    self.items += 1
+                    self.busy += busy
+                    self.blocked += blocked
+        finally:
+            # The last thread out tells the next stage, however this one ended
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+                if last:
+                    self.stopped = time.perf_counter()
+            if last:
+                for _ in range(self.downstream):
+                    self.outbox.put(None)
+    
+    def utilisation(self):
+        """Fraction of the stage's thread time spent working, so far"""
+        if self.started is None:
+            return 0.0
+        end = self.stopped if self.stopped is not None else time.perf_counter()
+        elapsed = (end - self.started) * self.workers
+        return self.busy / elapsed if elapsed > 0 else 0.0
+
 
 class BatchProcessor:
-    def __init__(self, input_dir, output_dir):
+    def __init__(self, input_dir, output_dir, include=IMAGE_PATTERNS, exclude=(), recursive=False):
+        """include and exclude are glob patterns, matched case-insensitively
+        against each path relative to input_dir and against its file name.
+        With recursive=True, subdirectories are processed too, and outputs
+        go to the same relative place under output_dir.
+        """
         self.input_dir = input_dir
         self.output_dir = output_dir
-        self.processing_queue = Queue()
-        self.results_queue = Queue()
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
         self.current_filter = None
         self.filter_params = {}
+        # {target name: Pipeline} and their PlanTree, for the current run
+        self.targets = {}
+        self.tree = None
+        # Intermediate frames of the filter threads, reused from image to image
+        self.buffers = BufferPool()
+        # BatchStages of the latest thread-mode run, for utilisation reports
+        self.stages = []
         
         # Create output directory if it doesn't exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
-    def process_image(self, image_path, filter_name, params=None):
+    def process_image(self, image_path, filter_name, params=None, plan=None, timings=None):
+        """Read and filter one image; returns it as BGR, or None on failure
+        
+        If timings is a dict, the seconds spent reading and filtering are
+        stored in it under 'read' and 'filter'.
+        """
+        if timings is None:
+            timings = {}
         try:
+            # Compile the plan unless the caller already has one
+            if plan is None:
+                if filter_name not in FILTER_REGISTRY:
+                    print(f"Filter {filter_name} not found.")
+                    return None
+                plan = Pipeline([filter_name], params).compile()
+            
             # Read image
+            start = time.perf_counter()
             image = cv2.imread(image_path)
+            timings['read'] = time.perf_counter() - start
             if image is None:
                 print(f"Failed to read image: {image_path}")
                 return None
             
             # Convert to RGB
+            start = time.perf_counter()
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
-            # Create instance of AdvancedFilters to access its methods
-            filters = AdvancedFilters()
-            
-            # Apply filter if it exists
-            if hasattr(filters, filter_name):
-                filter_func = getattr(filters, filter_name)
-                processed = filter_func(image, **(params or {}))
-            else:
-                print(f"Filter {filter_name} not found.")
-                return None
+            # Apply filter
+            processed = plan.run(image)
             
             # Convert back to BGR for saving
             processed = cv2.cvtColor(processed, cv2.COLOR_RGB2BGR)
+            timings['filter'] = time.perf_counter() - start
             return processed
             
         except Exception as e:
             print(f"Error processing {image_path}: {str(e)}")
             return None
     
-    def worker(self):
+    def decode_job(self, job, cancel_token):
+        """Decode stage: read the input as RGB; drops the job after a cancel"""
+        if cancel_token.cancelled:
+            return None
+        if job.skipped:
+            return job
+        start = time.perf_counter()
+        image = job.read()
+        if image is None:
+            print(f"Failed to read image: {job.input_path}")
+        else:
+            job.image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        job.timings['read'] = time.perf_counter() - start
+        return job
+    
+    def filter_job(self, job, cancel_token):
+        """Compute stage: run the pending targets and convert back to BGR for saving
+        
+        Drops the job after a cancel.
+        """
+        if cancel_token.cancelled:
+            return None
+        if job.image is None:
+            return job
+        start = time.perf_counter()
+        try:
+            for name, image in self.tree.run(job.image, job.pending, buffers=self.buffers).items():
+                job.results[name] = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        except Exception as e:
+            print(f"Error processing {job.input_path}: {str(e)}")
+            job.results = {}
+        job.image = None
+        job.timings['filter'] = time.perf_counter() - start
+        return job
+    
+    def encode_job(self, job):
+        """Encode stage: write the outputs and mark the job done"""
+        if job.results:
+            start = time.perf_counter()
+            for name, image in job.results.items():
+                job.written[name] = write_output(job.outputs[name], image)
+            job.timings['write'] = time.perf_counter() - start
+            job.results = {}
+            job.ok = all(job.written.get(name, False) for name in job.pending)
+        return job
+    
+    def iter_jobs(self, targets=None, per_target_dirs=False):
+        """Yield a BatchJob for every matching image, as discovery finds it
+        
+        Each job gets one output per target name (default: just the current
+        filter). Outputs go to the same relative place under output_dir, or
+        under output_dir/<target name> with per_target_dirs; directories are
+        created when the first file is written into them (see write_output).
+        """
+        if targets is None:
+            targets = [self.current_filter]
+        for relative_path in discover_images(self.input_dir, self.include, self.exclude,
+                                             self.recursive, skip_dirs=[self.output_dir]):
+            relative_dir, _, filename = relative_path.rpartition('/')
+            outputs = {}
+            for name in targets:
+                parts = ([name] if per_target_dirs else []) + (relative_dir.split('/') if relative_dir else [])
+                output_dir = os.path.join(self.output_dir, *parts)
+                outputs[name] = os.path.join(output_dir, f"processed_{filename}")
+            input_path = os.path.join(self.input_dir, *relative_path.split('/'))
+            yield BatchJob(input_path, outputs)
+    
+    def list_jobs(self):
+        """A BatchJob for every image in the input directory"""
+        return list(self.iter_jobs())
+    
+    def process_directory(self, filter_name, params=None, num_threads=4, mode='thread',
+                          on_result=None, cancel_token=None, incremental=True, **stage_options):
+        """Process every image in the input directory; returns [(input_path, ok), ...]
+        
+        on_result, if given, is called with each BatchResult as it arrives.
+        See iter_directory for the other arguments.
+        """
+        results = []
+        for result in self.iter_directory(filter_name, params, num_threads, mode, cancel_token,
+                                          incremental, **stage_options):
+            if on_result is not None:
+                on_result(result)
+            results.append((result.input_path, result.ok))
+        return results
+    
+    def iter_directory(self, filter_name, params=None, num_threads=4, mode='thread', cancel_token=None,
+                       incremental=True, **stage_options):
+        """Process every image in the input directory, yielding a BatchResult per file as it finishes
+        
+        mode='thread' filters on num_threads threads in this process, with
+        separate decode and encode pools around them; stage_options
+        (decode_threads, encode_threads, queue_size) are passed to
+        process_in_threads. mode='process' runs num_threads worker processes, which scales past
+        the GIL; frames travel to and from them through shared memory.
+        
+        Cancelling cancel_token skips every file not filtered yet; files
+        already past that still finish and are reported. Closing the
+        iterator early cancels the run as well.
+        
+        With incremental=True, files whose output the manifest in the
+        output directory shows as current are reported as skipped instead
+        of being processed again, and every file written is added to it.
+        
+        Files are handed to the workers as discovery finds them, so work
+        starts straight away. A second listing pass on its own thread only
+        counts them; BatchResult.total stays None until it has finished.
+        """
+        self.current_filter = filter_name
+        self.filter_params = params or {}
+        
+        if filter_name not in FILTER_REGISTRY:
+            print(f"Filter {filter_name} not found.")
+            return
+        targets = {filter_name: Pipeline([filter_name], self.filter_params)}
+        yield from self._iter_targets(targets, False, num_threads, mode, cancel_token, incremental,
+                                      stage_options)
+    
+    def process_presets(self, presets, params=None, num_threads=4, mode='thread',
+                        on_result=None, cancel_token=None, incremental=True, **stage_options):
+        """Apply every preset to each image; returns [(input_path, ok), ...]
+        
+        See iter_presets for the arguments.
+        """
+        results = []
+        for result in self.iter_presets(presets, params, num_threads, mode, cancel_token,
+                                        incremental, **stage_options):
+            if on_result is not None:
+                on_result(result)
+            results.append((result.input_path, result.ok))
+        return results
+    
+    def iter_presets(self, presets, params=None, num_threads=4, mode='thread', cancel_token=None,
+                     incremental=True, **stage_options):
+        """Apply every preset to each image, yielding a BatchResult per input file
+        
+        presets maps output names to a Pipeline, a filter name or a list of
+        filter names (the last two use params). Each image is decoded once;
+        stages the presets have in common at the start are run once and
+        their output shared. Outputs go to output_dir/<preset name>/.
+        The other arguments are as for iter_directory.
+        """
+        targets = {}
+        for name, preset in presets.items():
+            if isinstance(preset, Pipeline):
+                targets[name] = preset
+            else:
+                filters = [preset] if isinstance(preset, str) else list(preset)
+                targets[name] = Pipeline(filters, params or {})
+        yield from self._iter_targets(targets, True, num_threads, mode, cancel_token, incremental,
+                                      stage_options)
+    
+    def _iter_targets(self, targets, per_target_dirs, num_threads, mode, cancel_token, incremental,
+                      stage_options):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown batch mode: {mode}")
+        
+        # Compile every pipeline once for the whole run
+        self.targets = targets
+        self.tree = PlanTree({name: pipeline.compile() for name, pipeline in targets.items()})
+        recipes = {name: json.dumps(pipeline.key()) for name, pipeline in targets.items()}
+        
+        if cancel_token is None:
+            cancel_token = CancelToken()
+        start = time.perf_counter()
+        
+        manifest = BatchManifest(self.output_dir) if incremental else None
+        # A separate listing pass only counts files, so the total is known long
+        # before the workers have pulled every job; it stores nothing
+        found = None
+        
+        def count():
+            nonlocal found
+            files = 0
+            try:
+                for _ in discover_images(self.input_dir, self.include, self.exclude, self.recursive,
+                                         skip_dirs=[self.output_dir]):
+                    if cancel_token.cancelled:
+                        return
+                    files += 1
+            except Exception as e:
+                print(f"Error counting images: {str(e)}")
+                return
+            found = files
+        
+        def discover():
+            # Runs lazily as the workers ask for more; leaves only outputs that are not current
+            for job in self.iter_jobs(targets, per_target_dirs):
+                if manifest is not None:
+                    job.pending = [name for name in job.pending
+                                   if not manifest.is_current(job, job.outputs[name], recipes[name])]
+                    job.ok = job.skipped
+                yield job
+        
+        Thread(target=count, daemon=True).start()
+        
+        if mode == 'process':
+            finished = self.process_in_workers(discover(), num_threads, cancel_token)
+        else:
+            finished = self.process_in_threads(discover(), num_threads, cancel_token, **stage_options)
+        
+        try:
+            processed = 0
+            for done, job in enumerate(finished, 1):
+                if not job.skipped:
+                    processed += 1
+                    if manifest is not None:
+                        for name in job.pending:
+                            if job.written.get(name):
+                                manifest.record(job, job.outputs[name], recipes[name])
+                # The total is only known once counting has finished; files
+                # added to the tree since then may push done past it
+                total = None if found is None else max(found, done)
+                yield BatchResult(job, done, total, processed, time.perf_counter() - start, cancel_token)
+        except GeneratorExit:
+            # The consumer stopped listening, so stop the workers too
+            cancel_token.cancel()
+            finished.close()
+            raise
+        finally:
+            if manifest is not None:
+                manifest.close()
+    
+    def process_in_threads(self, jobs, num_threads, cancel_token, decode_threads=2,
+                           encode_threads=2, queue_size=None):
+        """Filter BatchJobs in staged thread pools, yielding each as it finishes
+        
+        Decoding, filtering and encoding each get their own pool, joined by
+        queues holding at most queue_size frames (default 2 * num_threads).
+        Decoders read ahead until the queue is full, which hides read
+        latency; the bounds cap how many frames are in memory at once.
+        Per-stage utilisation is in self.stages.
+        """
+        if queue_size is None:
+            queue_size = 2 * num_threads
+        pending = Queue(maxsize=queue_size)
+        decoded = Queue(maxsize=queue_size)
+        filtered = Queue(maxsize=queue_size)
+        results = Queue()
+        
+        self.stages = [
+            BatchStage('decode', lambda job: self.decode_job(job, cancel_token),
+                       decode_threads, pending, decoded, num_threads),
+            BatchStage('filter', lambda job: self.filter_job(job, cancel_token),
+                       num_threads, decoded, filtered, encode_threads),
+            BatchStage('encode', self.encode_job, encode_threads, filtered, results),
+        ]
+        for stage in self.stages:
+            stage.start()
+        
+        def feed():
+            try:
+                for job in jobs:
+                    if cancel_token.cancelled:
+                        break
+                    pending.put(job)
+            except Exception as e:
+                print(f"Error listing images: {str(e)}")
+                traceback.print_exc()
+            finally:
+                for _ in range(decode_threads):
+                    pending.put(None)
+        
+        Thread(target=feed, daemon=True).start()
+        
+        # The encode stage sends None once everything has been written
         while True:
-            # Get image path from queue
-            item = self.processing_queue.get()
+            item = results.get()
             if item is None:
                 break
-                
-            image_path, output_path = item
+            yield item
+        
+        for stage in self.stages:
+            stage.join()
+    
+    def stage_report(self):
+        """One line per stage of the latest thread-mode run: threads, utilisation, backpressure"""
+        lines = []
+        for stage in self.stages:
+            lines.append(f"{stage.name}: {stage.workers} threads, {stage.items} files, "
+                         f"{stage.utilisation():.0%} busy, {stage.blocked:.1f}s blocked downstream")
+        return "\n".join(lines)
+    
+    def process_in_workers(self, jobs, num_workers, cancel_token):
+        """Filter BatchJobs in a pool of worker processes, yielding each as it finishes
+        
+        Threads in this process decode each image straight into a shared
+        memory block, hand the block to a worker process, and encode the
+        result the worker left in a second block. Decoding and encoding
+        release the GIL, so they overlap with the workers' filtering.
+        """
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=({name: pipeline.key()
+                                            for name, pipeline in self.targets.items()},)) as pool:
+            def run(job):
+                if cancel_token.cancelled:
+                    return None
+                if not job.skipped:
+                    self.process_shared(pool, job)
+                return job
             
-            # Process image
-            result = self.process_image(image_path, self.current_filter, self.filter_params)
+            # Pull jobs lazily, two per worker process in flight, each on its own I/O
+            # thread: while one thread waits for its process to filter, the other
+            # decodes the next image or encodes the last result, so no process idles
+            in_flight = 2 * num_workers
+            jobs = iter(jobs)
+            running = set()
+            with ThreadPoolExecutor(max_workers=in_flight) as io:
+                try:
+                    while True:
+                        while len(running) < in_flight and not cancel_token.cancelled:
+                            job = next(jobs, None)
+                            if job is None:
+                                break
+                            running.add(io.submit(run, job))
+                        if not running:
+                            break
+                        
+                        finished, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            job = future.result()
+                            if job is not None:
+                                yield job
+                finally:
+                    # Jobs that have not started yet are dropped
+                    for future in running:
+                        future.cancel()
+    
+    def process_shared(self, pool, job):
+        """Decode, filter in a worker process, and save one BatchJob; returns success"""
+        timings = job.timings
+        source = None
+        results = {}
+        try:
+            start = time.perf_counter()
+            image = job.read()
+            timings['read'] = time.perf_counter() - start
+            if image is None:
+                print(f"Failed to read image: {job.input_path}")
+                return False
             
-            if result is not None:
-                # Save processed image
-                cv2.imwrite(output_path, result)
-                self.results_queue.put((image_path, True))
-            else:
-                self.results_queue.put((image_path, False))
+            # Convert to RGB directly into shared memory
+            start = time.perf_counter()
+            source = SharedFrame.create(image.shape)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=source.array)
+            del image
+            for name in job.pending:
+                results[name] = SharedFrame.create(source.shape)
             
-            self.processing_queue.task_done()
-    
-    def process_directory(self, filter_name, params=None, num_threads=4):
-        self.current_filter = filter_name
-        self.filter_params = params or {}
-        
-        # Start worker threads
-        threads = []
-        for _ in range(num_threads):
-            t = Thread(target=self.worker)
-            t.start()
-            threads.append(t)
-        
-        # Add images to queue
-        count = 0
-        for filename in os.listdir(self.input_dir):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
-                input_path = os.path.join(self.input_dir, filename)
-                output_path = os.path.join(self.output_dir, f"processed_{filename}")
-                self.processing_queue.put((input_path, output_path))
-                count += 1
-        
-        # Add None to queue to signal threads to exit
-        for _ in range(num_threads):
-            self.processing_queue.put(None)
-        
-        # Wait for all threads to complete
-        for t in threads:
-            t.join()
+            pool.submit(_filter_shared, source.name,
+                        {name: result.name for name, result in results.items()}, source.shape).result()
+            
+            # Convert back to BGR for saving
+            for name, result in results.items():
+                processed = cv2.cvtColor(result.array, cv2.COLOR_RGB2BGR)
+                write_start = time.perf_counter()
+                job.written[name] = write_output(job.outputs[name], processed)
+                timings['write'] = timings.get('write', 0.0) + time.perf_counter() - write_start
+            timings['filter'] = time.perf_counter() - start - timings['write']
+            job.ok = all(job.written.get(name, False) for name in job.pending)
+            return job.ok
         
-        # Collect results
-        results = []
-        while not self.results_queue.empty():
-            results.append(self.results_queue.get())
+        except Exception as e:
+            print(f"Error processing {job.input_path}: {str(e)}")
+            return False
         
-        return results
+        finally:
+            if source is not None:
+                source.release()
+            for result in results.values():
+                result.release()
     
     @staticmethod
     def create_contact_sheet(image_paths, cols=5, thumbnail_size=(200, 200)):
@@ -0,0 +1,144 @@
+"""Blur engine with paths whose cost does not grow with the radius.
+
+The box blur is always cv2.blur, which keeps running sums: O(1) per pixel
+and identical to filtering with a dense averaging kernel. The Gaussian is
+picked by radius and quality:
+
+    'exact'     cv2.GaussianBlur, O(radius) per pixel (the default)
+    'balanced'  GaussianBlur for small radii; from BOX_GAUSS_RADIUS, three
+                stacked box blurs of matching variance
+    'fast'      stacked boxes from FAST_BOX_RADIUS; once sigma is large
+                enough, blur a pyrDown'd copy and pyrUp it back
+
+All paths approximate GaussianBlur for a (2r+1)x(2r+1) kernel with the
+default sigma. The box and pyramid paths are not exact: on photos they
+differ from it by up to 7 levels ('balanced') or 10 levels ('fast') at
+the sharpest edges, so they are only used when asked for.
+"""
+import math
+import cv2
+
+BLUR_QUALITIES = ('exact', 'balanced', 'fast')
+
+# Radius from which 'balanced' uses stacked boxes instead of the direct Gaussian
+BOX_GAUSS_RADIUS = 12
+
+# Radius from which 'fast' uses stacked boxes
+FAST_BOX_RADIUS = 6
+
+# The pyramid only goes down while the Gaussian left at the coarse level
+# keeps at least this sigma (in coarse pixels)
+MIN_PYRAMID_SIGMA = 2.0
+
+# Number of stacked box passes
+BOX_PASSES = 3
+
+
+def kernel_sigma(radius):
+    """The sigma cv2.GaussianBlur uses for a (2r+1)-wide kernel when given sigma 0"""
+    ksize = 2 * radius + 1
+    return 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+
+
+def box_widths(sigma, passes=BOX_PASSES):
+    """Odd widths of passes box blurs whose combined variance is closest to sigma ** 2"""
+    ideal = math.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    # How many passes use the lower width; the rest use lower + 2
+    count = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+                  / (-4 * lower - 4))
+    count = min(max(count, 0), passes)
+    return [lower] * count + [lower + 2] * (passes - count)
+
+
+def pyramid_levels(sigma):
+    """How many pyrDown levels a Gaussian of sigma can go through
+
+    pyrDown and pyrUp each add variance 1 per level (in that level's
+    pixels); the rest of the blur is done at the coarsest level.
+    """
+    levels = 0
+    while sigma * sigma - 2 * (4 ** (levels + 1) - 1) / 3 > (MIN_PYRAMID_SIGMA * 2 ** (levels + 1)) ** 2:
+        levels += 1
+    return levels
+
+
+def gaussian_path(radius, quality='balanced'):
+    """'direct', 'box' or 'pyramid': how gaussian_blur handles radius at quality"""
+    if quality not in BLUR_QUALITIES:
+        raise ValueError(f"Unknown blur quality: {quality}")
+    if quality == 'fast':
+        if pyramid_levels(kernel_sigma(radius)) > 0:
+            return 'pyramid'
+        if radius >= FAST_BOX_RADIUS:
+            return 'box'
+    elif quality == 'balanced' and radius >= BOX_GAUSS_RADIUS:
+        return 'box'
+    return 'direct'
+
+
+def gaussian_halo(radius, quality='balanced'):
+    """Neighbourhood radius the Gaussian actually reads, for tiling
+
+    For the pyramid it is also a multiple of gaussian_align, so a tile
+    whose core starts on that grid reads a window that starts on it too.
+    """
+    path = gaussian_path(radius, quality)
+    if path == 'box':
+        return sum(width // 2 for width in box_widths(kernel_sigma(radius)))
+    if path == 'pyramid':
+        sigma = kernel_sigma(radius)
+        levels = pyramid_levels(sigma)
+        step = 2 ** levels
+        coarse_sigma = math.sqrt(sigma * sigma - 2 * (4 ** levels - 1) / 3) / step
+        # The coarse Gaussian's reach plus the pyrDown/pyrUp kernels, in coarse pixels
+        return step * (math.ceil(4 * coarse_sigma) + 2 * levels + 2)
+    return radius
+
+
+def gaussian_align(radius, quality='balanced'):
+    """Multiple of pixels a tile must start on to match the whole frame: the coarsest pyramid pixel, or 1"""
+    if gaussian_path(radius, quality) == 'pyramid':
+        return 2 ** pyramid_levels(kernel_sigma(radius))
+    return 1
+
+
+def gaussian_blur(image, radius, quality='balanced', out=None):
+    """Gaussian blur with a (2r+1)x(2r+1) kernel's default sigma, by the path quality allows
+
+    The result goes into out if given.
+    """
+    path = gaussian_path(radius, quality)
+    if path == 'box':
+        widths = box_widths(kernel_sigma(radius))
+        for width in widths[:-1]:
+            image = cv2.blur(image, (width, width))
+        return cv2.blur(image, (widths[-1], widths[-1]), dst=out)
+    if path == 'pyramid':
+        return _pyramid_gaussian(image, kernel_sigma(radius), out)
+    ksize = 2 * radius + 1
+    return cv2.GaussianBlur(image, (ksize, ksize), 0, dst=out)
+
+
+def _pyramid_gaussian(image, sigma, out=None):
+    levels = pyramid_levels(sigma)
+    sizes = [(image.shape[1], image.shape[0])]
+    for _ in range(levels):
+        image = cv2.pyrDown(image)
+        sizes.append((image.shape[1], image.shape[0]))
+
+    # What the pyramid has not blurred yet, at the coarse scale
+    coarse_sigma = math.sqrt(sigma * sigma - 2 * (4 ** levels - 1) / 3) / 2 ** levels
+    image = cv2.GaussianBlur(image, (0, 0), coarse_sigma)
+
+    for size in reversed(sizes[1:-1]):
+        image = cv2.pyrUp(image, dstsize=size)
+    return cv2.pyrUp(image, dst=out, dstsize=sizes[0])
+
+
+def box_blur(image, radius, out=None):
+    """Mean over a (2r+1)x(2r+1) window, in O(1) per pixel"""
+    ksize = 2 * radius + 1
+    return cv2.blur(image, (ksize, ksize), dst=out)
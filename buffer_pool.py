@@ -0,0 +1,51 @@
+"""Pool of preallocated frame buffers for intermediate stage outputs.
+
+A plan run with a pool writes each intermediate output into a pooled
+buffer (for stages that accept one, see FilterSpec.writes_out) and hands
+the buffer back as soon as the next stage has read it, so a chain of any
+length alternates between two buffers. Across frames of the same size, as
+in a batch, the same buffers are reused instead of allocating and
+faulting in fresh pages for every stage of every frame. A buffer handed
+back is dropped from derived_cache, since its next contents differ.
+"""
+from threading import Lock
+import numpy as np
+from derived_cache import derived_cache
+
+# Free buffers kept per shape; more are released to the allocator
+DEFAULT_MAX_FREE = 4
+
+
+class BufferPool:
+    def __init__(self, max_free=DEFAULT_MAX_FREE):
+        self.max_free = max_free
+        # (shape, dtype) -> free buffers
+        self._free = {}
+        self._lock = Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def take(self, shape, dtype=np.uint8):
+        """A buffer of shape and dtype, with undefined contents"""
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reused += 1
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, buffer):
+        """Return a buffer from take(); the caller must not use it afterwards"""
+        # Its next contents are a different frame
+        derived_cache().invalidate(buffer)
+        key = (buffer.shape, buffer.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_free:
+                free.append(buffer)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
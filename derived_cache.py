@@ -0,0 +1,71 @@
+"""Cache of colour-space conversions (gray, HSV, LAB) of source frames.
+
+Filters ask for derived(image, 'gray') instead of calling cvtColor, and a
+frame that is filtered again (the original or the display proxy, as
+sliders move) gets the conversion it had last time. Conversions are kept
+per source array in LRU order under a byte budget (see source_cache.py)
+and are read-only. Strips of a frame registered with add_band share the
+frame's conversion instead of each getting its own.
+"""
+from threading import Lock
+import cv2
+from source_cache import SourceCache
+
+# Default memory budget for cached conversions, in bytes
+DEFAULT_DERIVED_BUDGET = 128 * 1024 * 1024
+
+CONVERSIONS = {
+    'gray': cv2.COLOR_RGB2GRAY,
+    'hsv': cv2.COLOR_RGB2HSV,
+    'lab': cv2.COLOR_RGB2LAB,
+}
+
+
+class DerivedCache(SourceCache):
+    def __init__(self, budget_bytes=DEFAULT_DERIVED_BUDGET):
+        super().__init__(budget_bytes)
+        # id(band) -> (band, parent, top) for bands of rows registered by add_band
+        self._bands = {}
+        # Held while a parent frame is converted for its bands, so it is converted once
+        self._band_lock = Lock()
+
+    def add_band(self, band, parent, top):
+        """Serve band's conversions as rows top: of parent's until remove_band
+
+        StripExecutor registers its strips this way, so the conversion is
+        made (or found) once for the whole frame and every strip slices it,
+        and the next run on the same frame hits the cache.
+        """
+        with self._lock:
+            self._bands[id(band)] = (band, parent, top)
+
+    def remove_band(self, band):
+        with self._lock:
+            self._bands.pop(id(band), None)
+
+    def get(self, image, kind):
+        """image converted to kind ('gray', 'hsv' or 'lab'), from the cache if possible"""
+        band = self._bands.get(id(image))
+        if band is not None and band[0] is image:
+            _, parent, top = band
+            with self._band_lock:
+                whole = self.get(parent, kind)
+            return whole[top:top + image.shape[0]]
+        result = self.lookup(image, kind)
+        if result is None:
+            result = cv2.cvtColor(image, CONVERSIONS[kind])
+            self.store(image, kind, result)
+        return result
+
+
+_cache = DerivedCache()
+
+
+def derived(image, kind):
+    """image converted to kind, through the shared cache (read-only)"""
+    return _cache.get(image, kind)
+
+
+def derived_cache():
+    """The shared DerivedCache, e.g. to read its stats or change its budget"""
+    return _cache
@@ -0,0 +1,77 @@
+"""Persistent side-by-side display for the original and filtered image.
+
+The canvases and PhotoImages are created once and reused: the filtered side
+is updated in place with PhotoImage.paste, and the scaled original is only
+recomputed when the image or the display size changes.
+"""
+import tkinter as tk
+import PIL.Image
+import PIL.ImageTk
+
+ORIGINAL, FILTERED = 0, 1
+
+
+class DisplaySurface:
+    def __init__(self, original_frame, filtered_frame):
+        self.frames = (original_frame, filtered_frame)
+        self.canvases = []
+        self.items = []
+        self.photos = [None, None]
+        self._original_key = None
+
+        for frame in self.frames:
+            # Clear whatever was shown in the frame before
+            for widget in frame.winfo_children():
+                widget.destroy()
+
+            canvas = tk.Canvas(frame, borderwidth=0, highlightthickness=0)
+            canvas.pack(expand=True, fill="both", padx=5, pady=5)
+            item = canvas.create_image(0, 0, anchor="center")
+
+            # Keep the image centred when the canvas is resized
+            canvas.bind("<Configure>",
+                        lambda event, c=canvas, i=item: c.coords(i, event.width // 2, event.height // 2))
+            self.canvases.append(canvas)
+            self.items.append(item)
+
+    def _put(self, side, pil_image):
+        """Show pil_image on one side, pasting into the existing PhotoImage when sizes match"""
+        photo = self.photos[side]
+        if photo is not None and (photo.width(), photo.height()) == pil_image.size:
+            photo.paste(pil_image)
+            return
+        photo = PIL.ImageTk.PhotoImage(image=pil_image)
+        self.photos[side] = photo  # Keep a reference
+        canvas = self.canvases[side]
+        canvas.itemconfigure(self.items[side], image=photo)
+        canvas.coords(self.items[side], canvas.winfo_width() // 2, canvas.winfo_height() // 2)
+
+    def show(self, original, filtered, display_size, frame_number=None):
+        """Display both images at display_size
+
+        The original side is only redrawn when the original or the size
+        changes. A caller whose originals are short-lived arrays (live
+        frames) passes a frame number that changes with each of them,
+        since the id of a freed array can be reused by the next one.
+        """
+        key = (id(original) if frame_number is None else frame_number, display_size)
+        if key != self._original_key:
+            original_pil = PIL.Image.fromarray(original).resize(display_size, PIL.Image.LANCZOS)
+            self._put(ORIGINAL, original_pil)
+            self._original_key = key
+
+            # Configure minimum size for frames
+            min_size = max(display_size[0], display_size[1])
+            for frame in self.frames:
+                frame.configure(width=min_size, height=min_size)
+
+        filtered_pil = PIL.Image.fromarray(filtered)
+        if filtered_pil.size != display_size:
+            filtered_pil = filtered_pil.resize(display_size, PIL.Image.LANCZOS)
+        self._put(FILTERED, filtered_pil)
+
+    def destroy(self):
+        for canvas in self.canvases:
+            canvas.destroy()
+        self.canvases = []
+        self.photos = [None, None]
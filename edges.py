@@ -0,0 +1,79 @@
+"""Edge detectors computed in float32 / int16 into reusable scratch buffers.
+
+Each detector takes the frame's luma from derived_cache and returns its
+response: the gradient magnitude for Sobel and Prewitt (float32), the
+signed Laplacian for Laplace (int16, exact for 8-bit input). The returned
+array is a scratch buffer owned by the calling thread and is overwritten
+by its next call, so it must be used (normalized) straight away.
+normalize_edges takes |response| / peak to 8 bits in one pass.
+"""
+from threading import local
+import cv2
+import numpy as np
+from derived_cache import derived
+
+_PREWITT_X = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.float32)
+_PREWITT_Y = _PREWITT_X.T.copy()
+
+_scratch = local()
+
+
+def scratch(name, shape, dtype):
+    """This thread's buffer called name, reallocated only when shape or dtype change"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    buffer = buffers.get(name)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = buffers[name] = np.empty(shape, dtype=dtype)
+    return buffer
+
+
+def _gradient_magnitude(image, kernel_x, kernel_y):
+    gray = derived(image, 'gray')
+    shape = gray.shape
+    gx = scratch('gx', shape, np.float32)
+    gy = scratch('gy', shape, np.float32)
+    kernel_x(gray, gx)
+    kernel_y(gray, gy)
+    # sqrt(gx^2 + gy^2) with numpy, whose float32 ops round the same wherever an
+    # element sits; cv2.magnitude rounds its SIMD body and scalar tail differently,
+    # so strips and tiles would not match the whole frame
+    magnitude = np.multiply(gx, gx, out=scratch('magnitude', shape, np.float32))
+    magnitude += np.multiply(gy, gy, out=gy)
+    return np.sqrt(magnitude, out=magnitude)
+
+
+def sobel_response(image):
+    return _gradient_magnitude(image,
+                               lambda gray, dst: cv2.Sobel(gray, cv2.CV_32F, 1, 0, dst=dst, ksize=3),
+                               lambda gray, dst: cv2.Sobel(gray, cv2.CV_32F, 0, 1, dst=dst, ksize=3))
+
+
+def prewitt_response(image):
+    # Filtering into float32 keeps the negative gradients an 8-bit output would clip
+    return _gradient_magnitude(image,
+                               lambda gray, dst: cv2.filter2D(gray, cv2.CV_32F, _PREWITT_X, dst=dst),
+                               lambda gray, dst: cv2.filter2D(gray, cv2.CV_32F, _PREWITT_Y, dst=dst))
+
+
+def laplace_response(image):
+    gray = derived(image, 'gray')
+    return cv2.Laplacian(gray, cv2.CV_16S, dst=scratch('laplacian', gray.shape, np.int16))
+
+
+def response_peak(response):
+    """Largest |response|"""
+    low, high = cv2.minMaxLoc(response)[:2]
+    return max(-low, high)
+
+
+def normalize_edges(response, peak, out=None):
+    """|response| scaled so peak maps to 255, as an RGB uint8 image (written into out if given)"""
+    if peak <= 0:
+        edges = np.zeros(response.shape, dtype=np.uint8)
+    else:
+        # Scale, absolute value and rounding to 8 bits in one pass
+        edges = cv2.convertScaleAbs(response, dst=scratch('edges', response.shape, np.uint8),
+                                    alpha=255.0 / peak)
+    return cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB, dst=out)
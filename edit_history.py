@@ -0,0 +1,197 @@
+"""Undo/redo history that records operations instead of full frames.
+
+Each entry stores the operation that produced it (the enabled filters plus
+their parameters). Every few entries the rendered frame is also kept as a
+keyframe, optionally compressed or spilled to disk, and keyframes are evicted
+oldest first once they exceed the byte budget (RAM for in-memory and
+compressed keyframes, a separate one for spilled files). Any state can be rebuilt by
+re-running its operation on the original image.
+"""
+import os
+import tempfile
+import cv2
+import numpy as np
+
+# Default memory budget for keyframes, in bytes
+DEFAULT_HISTORY_BUDGET = 256 * 1024 * 1024
+
+# Default budget for keyframes spilled to disk, in bytes
+DEFAULT_DISK_BUDGET = 2 * 1024 * 1024 * 1024
+
+# Keep a keyframe for every n-th entry
+DEFAULT_KEYFRAME_INTERVAL = 4
+
+
+class HistoryEntry:
+    def __init__(self, operation):
+        self.operation = operation
+        self.keyframe = None
+        # Bytes the keyframe holds in RAM, and on disk
+        self.nbytes = 0
+        self.disk_bytes = 0
+
+    def store(self, image, storage, spill_dir):
+        """Keep image as this entry's keyframe, in the given storage mode"""
+        if storage == 'compressed':
+            ok, buffer = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+            if not ok:
+                raise ValueError("Could not compress history keyframe")
+            self.keyframe = ('compressed', buffer)
+            self.nbytes = buffer.nbytes
+        elif storage == 'disk':
+            fd, path = tempfile.mkstemp(suffix='.npy', dir=spill_dir)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, image)
+            self.keyframe = ('disk', path)
+            self.disk_bytes = image.nbytes
+        else:
+            # Read-only frames (rendered results) cannot change, so they are kept as they are
+            self.keyframe = ('memory', image if not image.flags.writeable else image.copy())
+            self.nbytes = image.nbytes
+
+    def load(self):
+        """Return the keyframe image, or None if this entry has none"""
+        if self.keyframe is None:
+            return None
+        kind, data = self.keyframe
+        if kind == 'compressed':
+            return cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+        if kind == 'disk':
+            return np.load(data)
+        return data if not data.flags.writeable else data.copy()
+
+    def drop(self):
+        """Release the keyframe (and its spill file)"""
+        if self.keyframe is not None and self.keyframe[0] == 'disk':
+            try:
+                os.remove(self.keyframe[1])
+            except OSError:
+                pass
+        self.keyframe = None
+        self.nbytes = 0
+        self.disk_bytes = 0
+
+
+class EditHistory:
+    """Operation-based undo/redo with keyframes kept under a byte budget
+
+    render(operation) must rebuild the frame for an operation; storage is
+    'memory', 'compressed' (lossless PNG in memory) or 'disk' (spilled to
+    .npy files in spill_dir, under disk_budget_bytes instead of budget_bytes).
+    """
+    def __init__(self, render, budget_bytes=DEFAULT_HISTORY_BUDGET,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, storage='memory', spill_dir=None,
+                 disk_budget_bytes=DEFAULT_DISK_BUDGET):
+        if storage not in ('memory', 'compressed', 'disk'):
+            raise ValueError(f"Unknown history storage: {storage}")
+        self.render = render
+        self.budget_bytes = budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.storage = storage
+        self.spill_dir = spill_dir
+        self.entries = []
+        self.position = -1
+        # The most recently recorded or reconstructed frame, which is on screen anyway
+        self._current = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def nbytes(self):
+        """Bytes of RAM held by keyframes"""
+        return sum(entry.nbytes for entry in self.entries)
+
+    @property
+    def disk_bytes(self):
+        """Bytes of keyframes spilled to disk"""
+        return sum(entry.disk_bytes for entry in self.entries)
+
+    def reset(self, operation, image):
+        """Start over with a single entry"""
+        self.clear()
+        self.record(operation, image)
+
+    def clear(self):
+        for entry in self.entries:
+            entry.drop()
+        self.entries = []
+        self.position = -1
+        self._current = None
+
+    def record(self, operation, image):
+        """Add a new state after the current one; returns False if the operation did not change"""
+        if self.position >= 0 and self.entries[self.position].operation == operation:
+            return False
+
+        # Truncate history if we're not at the end
+        for entry in self.entries[self.position + 1:]:
+            entry.drop()
+        del self.entries[self.position + 1:]
+
+        # The first entry is the starting state and is always cheap to rebuild
+        entry = HistoryEntry(operation)
+        index = len(self.entries)
+        budget = self.disk_budget_bytes if self.storage == 'disk' else self.budget_bytes
+        if index > 0 and index % self.keyframe_interval == 0 and image.nbytes <= budget:
+            entry.store(image, self.storage, self.spill_dir)
+        self.entries.append(entry)
+        self.position = len(self.entries) - 1
+        self._current = (self.position, image)
+        self._enforce_budget()
+        return True
+
+    def _enforce_budget(self):
+        """Evict keyframes, oldest first, until they fit their budgets"""
+        total, disk_total = self.nbytes, self.disk_bytes
+        for entry in self.entries:
+            if total <= self.budget_bytes and disk_total <= self.disk_budget_bytes:
+                break
+            over_ram = total > self.budget_bytes
+            over_disk = disk_total > self.disk_budget_bytes
+            if (over_ram and entry.nbytes) or (over_disk and entry.disk_bytes):
+                total -= entry.nbytes
+                disk_total -= entry.disk_bytes
+                entry.drop()
+
+    def stored_image(self, index):
+        """Frame for entry index from the cache or a keyframe, or None if it has to be re-rendered"""
+        if self._current is not None and self._current[0] == index:
+            return self._current[1]
+        image = self.entries[index].load()
+        if image is not None:
+            self._current = (index, image)
+        return image
+
+    def remember(self, index, image):
+        """Note image, rendered elsewhere, as the frame of entry index"""
+        self._current = (index, image)
+
+    def image_at(self, index):
+        """Frame for entry index, from the cache, a keyframe or by re-rendering"""
+        image = self.stored_image(index)
+        if image is None:
+            image = self.render(self.entries[index].operation)
+            self._current = (index, image)
+        return image
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.entries) - 1
+
+    def undo(self):
+        """Step back and return that state's frame, or None at the start"""
+        if not self.can_undo():
+            return None
+        self.position -= 1
+        return self.image_at(self.position)
+
+    def redo(self):
+        """Step forward and return that state's frame, or None at the end"""
+        if not self.can_redo():
+            return None
+        self.position += 1
+        return self.image_at(self.position)
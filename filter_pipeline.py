@@ -0,0 +1,781 @@
+"""GUI-free filter registry and compiled pipeline engine.
+
+Filters register themselves by name. An ordered Pipeline description is
+compiled once into an ExecutionPlan, and both the GUI (ImageCap) and the
+batch path (BatchProcessor) run the same plan.
+"""
+import cv2
+import numpy as np
+from advanced_filters import AdvancedFilters
+from vignette import apply_vignette
+from blur import gaussian_blur, gaussian_halo, gaussian_align, box_blur
+from median import median_blur
+from morphology import min_filter, max_filter
+from derived_cache import derived
+from edges import sobel_response, laplace_response, prewitt_response, response_peak, normalize_edges
+
+# Default filter parameters, shared by the GUI and the batch path
+DEFAULT_PARAMS = {
+    'intensity': 1.0,
+    'threshold': 127,
+    'temperature': 0,
+    'saturation': 1.0,
+    'vignette': 0.5,
+    'blur_radius': 5,
+    # 'exact', 'balanced' or 'fast' (see blur.py); the approximate ones are opt-in
+    'blur_quality': 'exact'
+}
+
+# Order in which enabled filters run (colour -> blur -> edge -> effects -> advanced)
+FILTER_ORDER = ['color', 'gray', 'threshold', 'increaseContrast', 'decreaseContrast',
+                'logTransformation', 'powerLowEnhancement', 'negativeEnhancement',
+                'temperature', 'saturation', 'gauss', 'median',
+                'average', 'min', 'max', 'sobel', 'laplace', 'prewitt', 'vignette', 'unsharp',
+                'histogramEqualization', 'sepia', 'vintage']
+
+# Parameters measured in pixels, scaled when a pipeline runs on a resized proxy
+SPATIAL_PARAMS = ('blur_radius',)
+
+# Decimal places slider values are rounded to, so nearby values share one result
+PARAM_DECIMALS = {'intensity': 2, 'threshold': 0, 'temperature': 0, 'saturation': 2,
+                  'vignette': 2, 'blur_radius': 0}
+
+FILTER_REGISTRY = {}
+
+
+def quantize_params(params):
+    """Copy of params with slider values rounded to PARAM_DECIMALS"""
+    result = dict(params)
+    for key, decimals in PARAM_DECIMALS.items():
+        if key in result:
+            value = round(float(result[key]), decimals)
+            result[key] = int(value) if decimals == 0 else value
+    return result
+
+
+_advanced = AdvancedFilters()
+
+
+class FilterSpec:
+    """Registered filter: the function plus what the compiler needs to know about it"""
+    def __init__(self, name, func, params=(), allocates=True, luma_input=False,
+                 neutral_output=False, noop=False, point=False, peak_table=None,
+                 single_pass=False, color_matrix=None, cross_channel=False, parts=(),
+                 halo=0, align=1, global_stat=None, tile_func=None, tileable=True, writes_out=False):
+        self.name = name
+        self.func = func
+        # Parameter names the filter reads from the parameter dict
+        self.params = tuple(params)
+        # Returns a new buffer and never writes into its input
+        self.allocates = allocates
+        # Only looks at the luma of its input
+        self.luma_input = luma_input
+        # Output has R == G == B
+        self.neutral_output = neutral_output
+        # Leaves the image unchanged
+        self.noop = noop
+        # Output pixel is a function of the same input pixel (per channel, or of
+        # the luma for luma_input filters), so the filter can be folded into a LUT
+        self.point = point
+        # For point filters whose mapping depends on the largest input value:
+        # peak_table(params, peak) returns the 256x1x3 table
+        self.peak_table = peak_table
+        # Already one native 8-bit pass, so not worth a LUT on its own
+        self.single_pass = single_pass
+        # For linear colour filters: color_matrix(params) returns the 3x4 affine
+        # matrix (RGB in, RGB out, last column is the offset)
+        self.color_matrix = color_matrix
+        # Output channels mix input channels (so a per-channel LUT cannot express it)
+        self.cross_channel = cross_channel
+        # Composite filters are expanded into these registered filters when compiled
+        self.parts = tuple(parts)
+        # Tiled execution (see tiled_processing.py). halo is the neighbourhood
+        # radius in pixels, an int or halo(params). Filters that depend on the
+        # whole frame provide global_stat(tile, params, context), a partial
+        # statistic over the tile core merged across tiles with np.maximum,
+        # and tile_func(tile, params, context) which gets the merged value as
+        # context.stat and the tile position as context.origin. Tiles start on
+        # rows and columns that are multiples of align, an int or align(params)
+        self.halo = halo
+        self.align = align
+        self.global_stat = global_stat
+        self.tile_func = tile_func
+        self.tileable = tileable
+        # func takes a third argument out: None, or an RGB uint8 frame the size
+        # of the input to write the result into (see buffer_pool.py)
+        self.writes_out = writes_out
+
+
+def register_filter(name, params=(), **flags):
+    """Decorator registering func(image, params) under name"""
+    def decorator(func):
+        FILTER_REGISTRY[name] = FilterSpec(name, func, params, **flags)
+        return func
+    return decorator
+
+
+class Stage:
+    """One filter bound to the parameter values it depends on"""
+    def __init__(self, spec, params):
+        self.spec = spec
+        self.name = spec.name
+        self.params = {key: params[key] for key in spec.params}
+
+    @property
+    def allocates(self):
+        return self.spec.allocates
+
+    @property
+    def halo(self):
+        halo = self.spec.halo
+        return halo(self.params) if callable(halo) else halo
+
+    @property
+    def align(self):
+        align = self.spec.align
+        return align(self.params) if callable(align) else align
+
+    def key(self):
+        return (self.name, tuple(sorted(self.params.items())))
+
+    def run(self, image, out=None):
+        """The stage's output, written into out if given and the filter can"""
+        if out is not None and self.spec.writes_out:
+            return self.spec.func(image, self.params, out)
+        return self.spec.func(image, self.params)
+
+    def run_tile(self, tile, context):
+        if self.spec.tile_func is not None:
+            return self.spec.tile_func(tile, self.params, context)
+        return self.spec.func(tile, self.params)
+
+    def __repr__(self):
+        return f"Stage({self.name}, {self.params})"
+
+
+class Pipeline:
+    """Ordered pipeline description: filter names plus the parameter set"""
+    def __init__(self, filters, params=None):
+        for name in filters:
+            if name not in FILTER_REGISTRY:
+                raise ValueError(f"Unknown filter: {name}")
+        self.filters = list(filters)
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update(params or {})
+
+    @classmethod
+    def from_flags(cls, all_filters, params=None):
+        """Build a pipeline from ImageCap-style {filter_name: enabled} flags"""
+        enabled = [name for name in FILTER_ORDER
+                   if all_filters.get(name) and name in FILTER_REGISTRY]
+        return cls(enabled, params)
+
+    def key(self):
+        """Hashable description: filter names plus the parameters those filters read"""
+        used = set()
+        for stage in self.stages():
+            used.update(stage.params)
+        return (tuple(self.filters), tuple(sorted((name, self.params[name]) for name in used)))
+
+    @classmethod
+    def from_key(cls, key):
+        filters, params = key
+        return cls(filters, dict(params))
+
+    def scaled(self, scale):
+        """Copy of the pipeline for an image resized by scale, with pixel sizes scaled to match"""
+        params = dict(self.params)
+        for key in SPATIAL_PARAMS:
+            params[key] = int(round(int(params[key]) * scale))
+        return Pipeline(self.filters, params)
+
+    def stages(self):
+        stages = []
+        for name in self.filters:
+            for part in FILTER_REGISTRY[name].parts or (name,):
+                stages.append(Stage(FILTER_REGISTRY[part], self.params))
+        return stages
+
+    def compile(self):
+        return compile_pipeline(self)
+
+
+class ExecutionPlan:
+    """Compiled, ready-to-run sequence of stages"""
+    def __init__(self, stages):
+        self.stages = stages
+        # Copy up front only if the first stage would otherwise write into the caller's buffer
+        self.copy_input = not stages or not stages[0].allocates
+        # prefix_keys[i] identifies the output of the first i stages (see prefix_cache.py)
+        self.prefix_keys = [tuple(stage.key() for stage in stages[:i])
+                            for i in range(len(stages) + 1)]
+
+    def run(self, image, should_stop=None, prefixes=None, strips=None, buffers=None):
+        """Run all stages on image; returns None if should_stop() turns True between stages
+
+        With a PrefixCache, the run resumes after the longest prefix of
+        stages already stored for image, and stores the outputs of the
+        stages it runs (all but the last). With a StripExecutor, each stage
+        runs on horizontal strips in parallel (see strip_processing.py).
+        With a BufferPool, and no PrefixCache to keep them, intermediate
+        outputs go into pooled buffers; the result is always a new array.
+        """
+        done, result = 0, None
+        if prefixes is not None:
+            done, result = prefixes.resume(image, self.prefix_keys)
+        if result is None:
+            result = image.copy() if self.copy_input else image
+        if prefixes is not None:
+            buffers = None
+        # The pooled buffer result is in, if any
+        pooled = None
+        for i in range(done, len(self.stages)):
+            if should_stop is not None and should_stop():
+                return None
+            stage = self.stages[i]
+            if not stage.allocates and not result.flags.writeable:
+                # Stored prefixes are shared and read-only
+                result = result.copy()
+            out = None
+            if buffers is not None and stage.spec.writes_out and i + 1 < len(self.stages):
+                out = buffers.take(result.shape[:2] + (3,))
+            output = stage.run(result, out) if strips is None else strips.run_stage(stage, result, out)
+            if out is not None and output is not out:
+                buffers.give(out)
+            if pooled is not None and output is not pooled:
+                buffers.give(pooled)
+            pooled = output if output is out or output is pooled else None
+            result = output
+            if prefixes is not None and i + 1 < len(self.stages):
+                prefixes.store(image, self.prefix_keys[i + 1], result)
+        return result
+
+    def __repr__(self):
+        return f"ExecutionPlan({[stage.name for stage in self.stages]})"
+
+
+class _PlanNode:
+    def __init__(self, stage=None):
+        self.stage = stage
+        self.children = {}
+        # Plans ending at this node, and all plans at or below it
+        self.names = []
+        self.below = set()
+
+
+class PlanTree:
+    """Several named plans run on one image, sharing their common leading stages
+
+    The plans are merged into a tree by stage key, so a prefix shared by
+    several plans is computed once and its output fed to each of them.
+    """
+    def __init__(self, plans):
+        self.root = _PlanNode()
+        for name, plan in plans.items():
+            node = self.root
+            node.below.add(name)
+            for stage in plan.stages:
+                key = stage.key()
+                if key not in node.children:
+                    node.children[key] = _PlanNode(stage)
+                node = node.children[key]
+                node.below.add(name)
+            node.names.append(name)
+
+    @property
+    def stage_count(self):
+        """Stages run per image for all plans, after sharing"""
+        count, nodes = 0, [self.root]
+        while nodes:
+            node = nodes.pop()
+            count += len(node.children)
+            nodes.extend(node.children.values())
+        return count
+
+    def run(self, image, names=None, buffers=None):
+        """Return {name: result} for the named plans (default all)
+
+        image is never written to. Results are not copies: a plan with no
+        stages returns image itself, and identical plans share one array.
+        With a BufferPool, outputs that are only read by the stages below
+        them go into pooled buffers.
+        """
+        wanted = self.root.below if names is None else set(names)
+        results = {}
+        self._run(self.root, image, wanted, results, buffers)
+        return results
+
+    def _run(self, node, image, wanted, results, buffers):
+        for name in node.names:
+            if name in wanted:
+                results[name] = image
+        for child in node.children.values():
+            if child.below.isdisjoint(wanted):
+                continue
+            # The parent's output feeds other branches too, so in-place stages get a copy
+            source = image if child.stage.allocates else image.copy()
+            out = None
+            if buffers is not None and not child.names and child.stage.spec.writes_out:
+                out = buffers.take(image.shape[:2] + (3,))
+            output = child.stage.run(source, out)
+            self._run(child, output, wanted, results, buffers)
+            # Unless a stage below passed it through unchanged as a result
+            if out is not None and not any(result is out for result in results.values()):
+                buffers.give(out)
+
+
+# ---------------------------------------------------------------------------
+# Optimisation passes: each takes and returns a list of stages
+# ---------------------------------------------------------------------------
+
+def drop_noop_stages(stages):
+    """Remove stages that leave the image unchanged"""
+    return [stage for stage in stages if not stage.spec.noop]
+
+
+def drop_redundant_gray(stages):
+    """Remove gray stages whose effect is already covered by a neighbour
+
+    Gray is redundant before a stage that only reads luma (threshold, edge
+    detectors) and after a stage whose output is already neutral.
+    """
+    result = []
+    for i, stage in enumerate(stages):
+        if stage.name == 'gray':
+            if i + 1 < len(stages) and stages[i + 1].spec.luma_input:
+                continue
+            if result and result[-1].spec.neutral_output:
+                continue
+        result.append(stage)
+    return result
+
+
+# Every 8-bit value in each of the three channels, used to tabulate point filters
+_RAMP = np.repeat(np.arange(256, dtype=np.uint8), 3).reshape(256, 1, 3)
+
+
+def _compose_tables(first, second):
+    """Table equivalent to looking up first, then second (both 256x1x3)"""
+    channels = [second[first[:, 0, c], 0, c] for c in range(3)]
+    return np.stack(channels, axis=-1).reshape(256, 1, 3)
+
+
+class PointLUT:
+    """Run of consecutive point stages collapsed into one 256-entry per-channel LUT
+
+    A luma_input head (threshold) turns the frame into luma first and the
+    table is then indexed by luma. Tables for filters that need the peak
+    input value (logTransformation) are rebuilt per image from a histogram,
+    everything else is tabulated once at compile time.
+    """
+    def __init__(self, stages):
+        self.head = stages[0] if stages[0].spec.luma_input else None
+        self.stages = stages
+        self.needs_peak = any(stage.spec.peak_table for stage in stages)
+        self.table = None if self.needs_peak else self.build_table()
+
+    def build_table(self, source=None, present=None):
+        """Compose the table; present (see present_values) replaces looking at source"""
+        table = _RAMP
+        for stage in self.stages:
+            if stage.spec.peak_table:
+                # Largest value any channel holds at this stage's input
+                if table is _RAMP and present is None:
+                    peak = int(source.max())
+                else:
+                    if present is None:
+                        present = self.present_values(source)
+                    peak = max(int(table[present[:, c], 0, c].max(initial=0)) for c in range(3))
+                stage_table = stage.spec.peak_table(stage.params, peak)
+            else:
+                stage_table = stage.run(_RAMP)
+            table = _compose_tables(table, stage_table)
+        return table
+
+    @staticmethod
+    def present_values(source):
+        """256x3 mask of which 8-bit values occur in each channel of source"""
+        channels = [0, 0, 0] if source.ndim == 2 else [0, 1, 2]
+        return np.stack([cv2.calcHist([source], [c], None, [256], [0, 256]).reshape(256) > 0
+                         for c in channels], axis=1)
+
+    def source(self, image):
+        return derived(image, 'gray') if self.head else image
+
+    def apply(self, source, table, out=None):
+        # A single-channel table is noticeably faster when all channels agree
+        uniform = (table[:, :, 0] == table[:, :, 1]).all() and (table[:, :, 0] == table[:, :, 2]).all()
+        if uniform:
+            table = np.ascontiguousarray(table[:, :, 0])
+            if source.ndim == 2:
+                return cv2.cvtColor(cv2.LUT(source, table), cv2.COLOR_GRAY2RGB, dst=out)
+        elif source.ndim == 2:
+            source = cv2.cvtColor(source, cv2.COLOR_GRAY2RGB)
+        return cv2.LUT(source, table, dst=out)
+
+    def __call__(self, image, params, out=None):
+        source = self.source(image)
+        table = self.table if self.table is not None else self.build_table(source)
+        return self.apply(source, table, out)
+
+    def tile_stat(self, tile, params, context):
+        return self.present_values(context.core_of(self.source(tile)))
+
+    def tile_run(self, tile, params, context):
+        table = self.table if self.table is not None else self.build_table(present=context.stat)
+        return self.apply(self.source(tile), table)
+
+
+def fuse_point_stages(stages):
+    """Collapse runs of consecutive point stages into single PointLUT stages
+
+    A luma_input point stage can only start a run. A run of one single_pass
+    stage is left alone since it would not get any cheaper.
+    """
+    result = []
+    run = []
+
+    def flush():
+        if len(run) == 1 and run[0].spec.single_pass:
+            result.append(run[0])
+        elif run:
+            params = {}
+            for stage in run:
+                params.update(stage.params)
+            lut = PointLUT(list(run))
+            spec = FilterSpec('+'.join(stage.name for stage in run), lut, params=params.keys(),
+                              global_stat=lut.tile_stat if lut.needs_peak else None,
+                              tile_func=lut.tile_run if lut.needs_peak else None, writes_out=True)
+            result.append(Stage(spec, params))
+        run.clear()
+
+    for stage in stages:
+        if not stage.spec.point:
+            flush()
+            result.append(stage)
+            continue
+        if stage.spec.luma_input:
+            flush()
+        run.append(stage)
+    flush()
+    return result
+
+
+def _compose_matrices(first, second):
+    """3x4 affine matrix equivalent to applying first, then second"""
+    linear = second[:, :3] @ first[:, :3]
+    offset = second[:, :3] @ first[:, 3] + second[:, 3]
+    return np.hstack([linear, offset[:, np.newaxis]])
+
+
+# Largest difference (in 8-bit levels) a fused colour matrix may show against
+# running its stages one by one
+MAX_COLOR_MATRIX_ERROR = 4
+
+# 17x17x17 lattice over the RGB cube, corners included, for checking fusions
+_LATTICE = np.stack(np.meshgrid(*[np.linspace(0, 255, 17).astype(np.uint8)] * 3, indexing='ij'),
+                    axis=-1).reshape(-1, 1, 3)
+
+
+class ColorMatrix:
+    """Run of linear colour stages combined into one 3x4 affine colour matrix
+
+    The matrix is composed once at compile time and applied with a single
+    cv2.transform pass. The result is clamped once at the end rather than
+    after every stage, so pixels an earlier stage saturated can differ a
+    little from the stage-by-stage result.
+    """
+    def __init__(self, stages):
+        matrix = np.hstack([np.eye(3), np.zeros((3, 1))])
+        for stage in stages:
+            matrix = _compose_matrices(matrix, stage.spec.color_matrix(stage.params))
+        self.matrix = matrix.astype(np.float32)
+
+    def __call__(self, image, params, out=None):
+        return cv2.transform(image, self.matrix, dst=out)
+
+    @staticmethod
+    def error(stages):
+        """Largest difference between the fused and stage-by-stage result over the lattice"""
+        expected = _LATTICE
+        for stage in stages:
+            expected = stage.run(expected)
+        fused = ColorMatrix(stages)(_LATTICE, {})
+        return int(np.abs(expected.astype(np.int16) - fused).max())
+
+
+def fuse_color_matrices(stages):
+    """Collapse runs of linear colour stages into single ColorMatrix stages
+
+    Runs are only fused if they mix channels (runs of per-channel stages are
+    left to fuse_point_stages, whose LUTs are exact) and only as far as the
+    fused result stays within MAX_COLOR_MATRIX_ERROR of the unfused one, so
+    e.g. a strong temperature shift that saturates before gray is not fused.
+    """
+    result = []
+    run = []
+
+    def flush():
+        if len(run) > 1 and any(stage.spec.cross_channel for stage in run):
+            params = {}
+            for stage in run:
+                params.update(stage.params)
+            spec = FilterSpec('+'.join(stage.name for stage in run), ColorMatrix(list(run)),
+                              params=params.keys(), writes_out=True)
+            result.append(Stage(spec, params))
+        else:
+            result.extend(run)
+        run.clear()
+
+    for stage in stages:
+        if not stage.spec.color_matrix:
+            flush()
+            result.append(stage)
+            continue
+        if run and ColorMatrix.error(run + [stage]) > MAX_COLOR_MATRIX_ERROR:
+            flush()
+        run.append(stage)
+    flush()
+    return result
+
+
+OPTIMIZATION_PASSES = [drop_noop_stages, drop_redundant_gray, fuse_color_matrices,
+                       fuse_point_stages]
+
+
+def compile_pipeline(pipeline):
+    """Compile a Pipeline into an ExecutionPlan, running all optimisation passes"""
+    stages = pipeline.stages()
+    for optimization in OPTIMIZATION_PASSES:
+        stages = optimization(stages)
+    return ExecutionPlan(stages)
+
+
+# ---------------------------------------------------------------------------
+# Filters
+# ---------------------------------------------------------------------------
+
+@register_filter('color', noop=True, allocates=False)
+def color(image, params):
+    return image
+
+
+def _gray_matrix(params):
+    # ITU-R BT.601 luma weights, as used by COLOR_RGB2GRAY
+    return np.array([[0.299, 0.587, 0.114, 0]] * 3)
+
+
+@register_filter('gray', neutral_output=True, color_matrix=_gray_matrix, cross_channel=True,
+                 writes_out=True)
+def gray(image, params, out=None):
+    return cv2.cvtColor(derived(image, 'gray'), cv2.COLOR_GRAY2RGB, dst=out)
+
+
+@register_filter('threshold', params=('threshold',), luma_input=True, neutral_output=True,
+                 point=True, single_pass=True, writes_out=True)
+def threshold(image, params, out=None):
+    _, result = cv2.threshold(derived(image, 'gray'), params['threshold'], 255, cv2.THRESH_BINARY)
+    return cv2.cvtColor(result, cv2.COLOR_GRAY2RGB, dst=out)
+
+
+@register_filter('increaseContrast', point=True, single_pass=True, writes_out=True)
+def increase_contrast(image, params, out=None):
+    return cv2.convertScaleAbs(image, dst=out, alpha=1.5, beta=0)
+
+
+@register_filter('decreaseContrast', point=True, single_pass=True, writes_out=True)
+def decrease_contrast(image, params, out=None):
+    return cv2.convertScaleAbs(image, dst=out, alpha=0.5, beta=0)
+
+
+def _log_table(params, peak):
+    # Same float32 arithmetic as log_transformation, normalised by the peak input value
+    log_ramp = np.log(_RAMP.astype(np.float32) / 255.0 + 1.0)
+    if peak == 0:
+        return np.zeros_like(_RAMP)
+    return np.uint8(255 * (log_ramp / log_ramp[peak, 0, 0]))
+
+
+@register_filter('logTransformation', point=True, peak_table=_log_table, tileable=False)
+def log_transformation(image, params):
+    # Convert to float32 for logarithmic operation
+    log_img = image.astype(np.float32) / 255.0
+    # Add small constant to avoid log(0)
+    log_img = np.log(log_img + 1.0)
+    # Normalize to 0-255 range
+    return np.uint8(255 * (log_img / np.max(log_img)))
+
+
+@register_filter('powerLowEnhancement', params=('intensity',), point=True)
+def power_low_enhancement(image, params):
+    # Power-law (gamma) transform, with the intensity slider as gamma
+    result = 255.0 * (image.astype(np.float32) / 255.0) ** params['intensity']
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+@register_filter('negativeEnhancement', point=True, single_pass=True, writes_out=True)
+def negative_enhancement(image, params, out=None):
+    return cv2.bitwise_not(image, dst=out)
+
+
+def _temperature_matrix(params):
+    temp = params['temperature']
+    if temp > 0:
+        scale = (1 - temp/200, 1, 1 + temp/100)
+    else:
+        scale = (1 - temp/100, 1, 1 + temp/200)
+    return np.hstack([np.diag(scale), np.zeros((3, 1))])
+
+
+@register_filter('temperature', params=('temperature',), point=True,
+                 color_matrix=_temperature_matrix)
+def temperature(image, params):
+    temp = params['temperature']
+    result = image.astype(np.float32)
+    if temp > 0:  # Warmer
+        result[:,:,2] = np.clip(result[:,:,2] * (1 + temp/100), 0, 255)  # More red
+        result[:,:,0] = np.clip(result[:,:,0] * (1 - temp/200), 0, 255)  # Less blue
+    else:  # Cooler
+        result[:,:,0] = np.clip(result[:,:,0] * (1 - temp/100), 0, 255)  # More blue
+        result[:,:,2] = np.clip(result[:,:,2] * (1 + temp/200), 0, 255)  # Less red
+    return result.astype(np.uint8)
+
+
+@register_filter('saturation', params=('saturation',))
+def saturation(image, params):
+    # Scale S in HSV, through a table that leaves H and V alone
+    table = np.repeat(_RAMP[:, :, :1], 3, axis=2)
+    table[:, 0, 1] = np.clip(np.arange(256, dtype=np.float32) * params['saturation'], 0, 255)
+    hsv = cv2.LUT(derived(image, 'hsv'), table)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB)
+
+
+def _blur_halo(params):
+    return int(params['blur_radius'])
+
+
+def _gauss_halo(params):
+    return gaussian_halo(int(params['blur_radius']), params['blur_quality'])
+
+
+def _gauss_align(params):
+    return gaussian_align(int(params['blur_radius']), params['blur_quality'])
+
+
+@register_filter('gauss', params=('blur_radius', 'blur_quality'), halo=_gauss_halo, align=_gauss_align,
+                 writes_out=True)
+def gauss(image, params, out=None):
+    return gaussian_blur(image, int(params['blur_radius']), params['blur_quality'], out=out)
+
+
+def _median_tile(tile, params, context):
+    # Strips and tiles are already filtered in parallel, so no second split
+    return cv2.medianBlur(tile, 2 * int(params['blur_radius']) + 1)
+
+
+@register_filter('median', params=('blur_radius',), halo=_blur_halo, tile_func=_median_tile,
+                 writes_out=True)
+def median(image, params, out=None):
+    # Odd kernel of 2 * radius + 1, filtered in parallel strips
+    return median_blur(image, int(params['blur_radius']), out=out)
+
+
+@register_filter('average', params=('blur_radius',), halo=_blur_halo, writes_out=True)
+def average(image, params, out=None):
+    # Running sums: same result as a dense averaging kernel, at any radius
+    return box_blur(image, int(params['blur_radius']), out=out)
+
+
+@register_filter('min', params=('blur_radius',), halo=_blur_halo, writes_out=True)
+def minimum(image, params, out=None):
+    # Erosion over a (2r+1)x(2r+1) square, constant cost per pixel at large radii
+    return min_filter(image, int(params['blur_radius']), out=out)
+
+
+@register_filter('max', params=('blur_radius',), halo=_blur_halo, writes_out=True)
+def maximum(image, params, out=None):
+    # Dilation over the same square
+    return max_filter(image, int(params['blur_radius']), out=out)
+
+
+def _edge_filter(name, response):
+    """Register an edge detector given a function computing its response (see edges.py)"""
+    def peak_stat(tile, params, context):
+        # Keep the response for tile_func; a copy, as it is in this thread's scratch buffer
+        context.partial = response(tile).copy()
+        return response_peak(context.core_of(context.partial))
+
+    def tile_func(tile, params, context):
+        # Normalize by the peak of the whole frame
+        result = context.partial if context.partial is not None else response(tile)
+        return normalize_edges(result, context.stat)
+
+    @register_filter(name, luma_input=True, neutral_output=True, halo=1,
+                     global_stat=peak_stat, tile_func=tile_func, writes_out=True)
+    def edge_filter(image, params, out=None):
+        result = response(image)
+        return normalize_edges(result, response_peak(result), out)
+    return edge_filter
+
+
+sobel = _edge_filter('sobel', sobel_response)
+laplace = _edge_filter('laplace', laplace_response)
+prewitt = _edge_filter('prewitt', prewitt_response)
+
+
+def _vignette_tile(tile, params, context):
+    return apply_vignette(tile, 2 * params['vignette'], context.full_shape, context.origin)
+
+
+@register_filter('vignette', params=('vignette',), tile_func=_vignette_tile, writes_out=True)
+def vignette(image, params, out=None):
+    # Apply vignette strength
+    return apply_vignette(image, 2 * params['vignette'], out=out)
+
+
+@register_filter('unsharp', halo=4)
+def unsharp(image, params):
+    return _advanced.unsharp_mask(image)
+
+
+# CLAHE works on a grid laid over the whole frame, so it cannot be tiled
+@register_filter('histogramEqualization', tileable=False)
+def histogram_equalization(image, params):
+    return _advanced.histogram_equalization(image)
+
+
+# Sepia tone matrix, as in AdvancedFilters.sepia
+_SEPIA = np.array([[0.393, 0.769, 0.189],
+                   [0.349, 0.686, 0.168],
+                   [0.272, 0.534, 0.131]])
+
+
+@register_filter('sepia', color_matrix=lambda params: np.hstack([_SEPIA, np.zeros((3, 1))]),
+                 cross_channel=True)
+def sepia(image, params):
+    return _advanced.sepia(image)
+
+
+@register_filter('vintage', parts=('vintageTone', 'vintageVignette'))
+def vintage(image, params):
+    return _advanced.vintage(image)
+
+
+def _vintage_tone_matrix(params):
+    # 0.8 * image + 0.2 * warm overlay
+    return np.hstack([np.eye(3) * 0.8, 0.2 * np.array([[255], [240], [220]])])
+
+
+@register_filter('vintageTone', point=True, color_matrix=_vintage_tone_matrix, writes_out=True)
+def vintage_tone(image, params, out=None):
+    return _advanced.vintage_tone(image, out)
+
+
+def _vintage_vignette_tile(tile, params, context):
+    # Same steps as AdvancedFilters.vintage_vignette, with the mask cut to the tile
+    return apply_vignette(tile, 0.5, context.full_shape, context.origin, blur=True)
+
+
+@register_filter('vintageVignette', halo=1, tile_func=_vintage_vignette_tile, writes_out=True)
+def vintage_vignette(image, params, out=None):
+    return apply_vignette(image, 0.5, blur=True, out=out)
@@ -2,31 +2,46 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.filedialog
 import cv2
-import PIL.Image
-import PIL.ImageTk
-import PIL.ImageFilter
-import numpy as np
-from typing import List, Dict
 from advanced_filters import AdvancedFilters
+from filter_pipeline import Pipeline, DEFAULT_PARAMS, quantize_params
+from result_cache import ResultCache, DEFAULT_RESULT_BUDGET
+from prefix_cache import PrefixCache, DEFAULT_PREFIX_BUDGET
+from strip_processing import StripExecutor
+from live_capture import LiveProcessor, RateMeter
+from render_scheduler import RenderScheduler
+from display_surface import DisplaySurface
+from edit_history import EditHistory, DEFAULT_HISTORY_BUDGET
 import os
+import time
+
+# Quiet time after the last parameter change before the full-resolution render starts
+PREVIEW_REFINE_MS = 250
+
+# Frames per second the live view is redrawn at
+LIVE_TARGET_FPS = 30
+
+# Seconds between frame rate updates in the window title
+LIVE_STATS_INTERVAL = 1.0
+
 
 class ImageCap:
-    def __init__(self, window=None):
+    def __init__(self, window=None, history_budget=DEFAULT_HISTORY_BUDGET, history_storage='memory',
+                 result_budget=DEFAULT_RESULT_BUDGET, prefix_budget=DEFAULT_PREFIX_BUDGET):
         self.window = window
-        self.history: List[np.ndarray] = []
-        self.history_position = -1
+        # Undo history records operations and rebuilds frames from the original on demand
+        self.history = EditHistory(self.render_operation, budget_bytes=history_budget,
+                                   storage=history_storage)
+        # Recently rendered frames, so going back to a filter or value is instant
+        self.results = ResultCache(result_budget)
+        # Outputs of leading stages, so a change late in the chain only re-runs the tail
+        self.prefixes = PrefixCache(prefix_budget)
+        # Runs each stage on horizontal strips on all cores
+        self.strips = StripExecutor()
         self.zoom_factor = 1.0
         self.original_size = (400, 400)
         
         # Initialize filter parameters
-        self.filter_params = {
-            'intensity': 1.0,
-            'threshold': 127,
-            'temperature': 0,
-            'saturation': 1.0,
-            'vignette': 0.5,
-            'blur_radius': 5
-        }
+        self.filter_params = dict(DEFAULT_PARAMS)
         
         self.all_filters = {x: False for x in ['color', 'gray', 'threshold', 'increaseContrast', 
                                              'decreaseContrast', 'logTransformation', 'powerLowEnhancement',
@@ -37,14 +52,31 @@ class ImageCap:
         
         # Initialize advanced filters
         self.advanced_filters = AdvancedFilters()
+        
+        # Renders run in the background when there is a mainloop to report back to
+        self.scheduler = RenderScheduler(window) if window is not None else None
+        self._refine_id = None
+        self._plans = {}
+        
+        # Display-size proxy of the original, and the preview rendered from it
+        self._proxy = None
+        self._proxy_key = None
+        self.preview_image = None
+        self.needs_full_render = False
+        # History entry being rebuilt in the background after an undo or redo
+        self._history_index = None
+        
+        # Canvases the images are shown on, built on first display
+        self.surface = None
     
-    def set_filter_params(self, params):
+    def set_filter_params(self, params, refresh=True):
         """Update filter parameters and trigger update if needed"""
         try:
             # Store old parameters for comparison
             old_params = self.filter_params.copy()
             
-            # Update parameters
+            # Update parameters, rounded to slider resolution so revisited values hit the cache
+            params = quantize_params(params)
             self.filter_params.update(params)
             
             # Check if any parameter actually changed
@@ -55,137 +87,51 @@ class ImageCap:
                     print(f"Parameter {key} changed from {old_params[key]} to {value}")
                     break
             
-            # Only update if parameters changed
-            if changed:
-                self.update()
+            # Only update if parameters changed; the full render waits until the user stops
+            if changed and refresh:
+                self.update(refine_delay=PREVIEW_REFINE_MS)
                 
         except Exception as e:
             print(f"Error updating filter parameters: {str(e)}")
             import traceback
             traceback.print_exc()
     
+    def get_plan(self, scale=1.0):
+        """Return the compiled plan for the current filters, recompiling only when they change
+
+        With scale < 1 the plan is for a proxy resized by that factor, with
+        pixel-sized parameters such as blur_radius scaled to match.
+        """
+        return self._plan_entry(scale)[1]
+    
+    def _plan_entry(self, scale=1.0):
+        """(pipeline key, compiled plan) for the current filters at scale"""
+        pipeline = Pipeline.from_flags(self.all_filters, self.filter_params)
+        if scale != 1.0:
+            pipeline = pipeline.scaled(scale)
+        key = pipeline.key()
+        slot = 'full' if scale == 1.0 else 'preview'
+        if slot not in self._plans or self._plans[slot][0] != key:
+            self._plans[slot] = (key, pipeline.compile())
+        return self._plans[slot]
+    
+    def current_operation(self):
+        """The enabled filters and parameters, as recorded in history"""
+        return Pipeline.from_flags(self.all_filters, self.filter_params).key()
+    
+    def render_operation(self, operation):
+        """Rebuild the full-resolution frame for a recorded operation"""
+        return self.results.render(self.original_image, operation, **self.run_options())
+    
+    def run_options(self):
+        """Keyword arguments for ExecutionPlan.run: the stage prefix cache and strip executor"""
+        return {'prefixes': self.prefixes, 'strips': self.strips}
+    
     def apply_filter(self, image):
         """Apply selected filters to the image"""
         try:
-            result = image.copy()
-            
-            # Basic filters
-            if self.all_filters['gray']:
-                result = cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
-                result = cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
-            
-            if self.all_filters['threshold']:
-                gray = cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
-                _, result = cv2.threshold(gray, self.filter_params['threshold'], 255, cv2.THRESH_BINARY)
-                result = cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
-            
-            # Enhancement filters
-            if self.all_filters['increaseContrast']:
-                result = cv2.convertScaleAbs(result, alpha=1.5, beta=0)
-            
-            if self.all_filters['decreaseContrast']:
-                result = cv2.convertScaleAbs(result, alpha=0.5, beta=0)
-            
-            if self.all_filters['logTransformation']:
-                # Convert to float32 for logarithmic operation
-                log_img = result.astype(np.float32) / 255.0
-                # Add small constant to avoid log(0)
-                log_img = np.log(log_img + 1.0)
-                # Normalize to 0-255 range
-                result = np.uint8(255 * (log_img / np.max(log_img)))
-            
-            # Color adjustments
-            if self.all_filters['temperature']:
-                temp = self.filter_params['temperature']
-                if temp > 0:  # Warmer
-                    result = result.astype(np.float32)
-                    result[:,:,2] = np.clip(result[:,:,2] * (1 + temp/100), 0, 255)  # More red
-                    result[:,:,0] = np.clip(result[:,:,0] * (1 - temp/200), 0, 255)  # Less blue
-                    result = result.astype(np.uint8)
-                else:  # Cooler
-                    result = result.astype(np.float32)
-                    result[:,:,0] = np.clip(result[:,:,0] * (1 - temp/100), 0, 255)  # More blue
-                    result[:,:,2] = np.clip(result[:,:,2] * (1 + temp/200), 0, 255)  # Less red
-                    result = result.astype(np.uint8)
-            
-            if self.all_filters['saturation']:
-                # Convert to HSV for saturation adjustment
-                hsv = cv2.cvtColor(result, cv2.COLOR_RGB2HSV).astype(np.float32)
-                hsv[:,:,1] = np.clip(hsv[:,:,1] * self.filter_params['saturation'], 0, 255)
-                result = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2RGB)
-            
-            # Blur filters
-            if self.all_filters['gauss']:
-                # Ensure kernel size is odd
-                kernel_size = int(self.filter_params['blur_radius']) * 2 + 1
-                result = cv2.GaussianBlur(result, (kernel_size, kernel_size), 0)
-            
-            if self.all_filters['median']:
-                # Ensure kernel size is odd
-                kernel_size = int(self.filter_params['blur_radius']) * 2 + 1
-                result = cv2.medianBlur(result, kernel_size)
-            
-            if self.all_filters['average']:
-                kernel_size = int(self.filter_params['blur_radius']) * 2 + 1
-                kernel = np.ones((kernel_size, kernel_size), np.float32) / (kernel_size * kernel_size)
-                result = cv2.filter2D(result, -1, kernel)
-            
-            # Edge detection
-            if self.all_filters['sobel']:
-                gray = cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
-                sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-                sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-                # Compute magnitude and normalize
-                magnitude = np.sqrt(sobelx**2 + sobely**2)
-                result = np.uint8(255 * magnitude / np.max(magnitude))
-                result = cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
-            
-            if self.all_filters['laplace']:
-                gray = cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
-                laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-                # Normalize the result
-                result = np.uint8(255 * np.abs(laplacian) / np.max(np.abs(laplacian)))
-                result = cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
-            
-            if self.all_filters['prewitt']:
-                gray = cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
-                kernelx = np.array([[1,1,1],[0,0,0],[-1,-1,-1]])
-                kernely = np.array([[-1,0,1],[-1,0,1],[-1,0,1]])
-                prewittx = cv2.filter2D(gray, -1, kernelx)
-                prewitty = cv2.filter2D(gray, -1, kernely)
-                # Compute magnitude and normalize
-                magnitude = np.sqrt(prewittx.astype(float)**2 + prewitty.astype(float)**2)
-                result = np.uint8(255 * magnitude / np.max(magnitude))
-                result = cv2.cvtColor(result, cv2.COLOR_GRAY2RGB)
-            
-            # Effects
-            if self.all_filters['vignette']:
-                rows, cols = result.shape[:2]
-                # Generate vignette mask
-                kernel_x = cv2.getGaussianKernel(cols, cols/2)
-                kernel_y = cv2.getGaussianKernel(rows, rows/2)
-                kernel = kernel_y * kernel_x.T
-                mask = kernel / kernel.max()
-                # Apply vignette strength
-                mask = mask ** (2 * self.filter_params['vignette'])
-                # Convert to 3 channels and apply
-                mask_3d = np.dstack([mask] * 3)
-                result = np.uint8(result * mask_3d)
-            
-            # Advanced filters
-            if self.all_filters['unsharp']:
-                result = self.advanced_filters.unsharp_mask(result)
-            
-            if self.all_filters['histogramEqualization']:
-                result = self.advanced_filters.histogram_equalization(result)
-            
-            if self.all_filters['sepia']:
-                result = self.advanced_filters.sepia(result)
-            
-            if self.all_filters['vintage']:
-                result = self.advanced_filters.vintage(result)
-            
-            return result
+            key, plan = self._plan_entry()
+            return self.results.render(image, key, plan, **self.run_options())
             
         except Exception as e:
             print(f"Error applying filter: {str(e)}")
@@ -193,41 +139,125 @@ class ImageCap:
             traceback.print_exc()
             return image.copy()
 
-    def update(self):
-        """Update the displayed image with current filters"""
+    def update(self, refine_delay=0):
+        """Update the displayed image with current filters
+
+        In the GUI a display-size preview is shown straight away and the
+        full-resolution render follows in the background after refine_delay
+        ms, so it only starts once the user stops changing parameters.
+        """
         if not hasattr(self, 'original_image'):
             return
-            
+        
+        # Without a window there is no mainloop to hand results back to
+        if self.scheduler is None:
+            self.finish_update(self.apply_filter(self.original_image), self.current_operation())
+            return
+        
+        self.cancel_render()
+        
+        # A frame rendered before (flipping between filters, scrubbing back) is shown at once
+        cached = self.results.lookup(self.original_image, self._plan_entry()[0])
+        if cached is not None:
+            self.finish_update(cached, self.current_operation())
+            return
+        
+        self.needs_full_render = True
+        self.show_preview()
+        self._refine_id = self.window.after(refine_delay, self.refine)
+    
+    def show_preview(self, operation=None):
+        """Render the current filters, or a recorded operation, on the display-size proxy and show it"""
         try:
-            # Start with original image
-            self.filtered_image = self.original_image.copy()
-            
-            # Apply active filters
-            if any(self.all_filters.values()):
-                self.filtered_image = self.apply_filter(self.filtered_image)
+            proxy = self.get_proxy()
+            scale = proxy.shape[1] / self.original_image.shape[1]
+            if operation is None:
+                key, plan = self._plan_entry(scale)
+            else:
+                pipeline = Pipeline.from_key(operation).scaled(scale)
+                key, plan = pipeline.key(), pipeline.compile()
+            self.preview_image = self.results.render(proxy, key, plan, **self.run_options())
+            self.show_image()
+        except Exception as e:
+            print(f"Error rendering preview: {str(e)}")
+            self.preview_image = None
+    
+    def refine(self):
+        """Start the full-resolution render in the background"""
+        self._refine_id = None
+        try:
+            # Compile on the Tk thread so the worker never reads mutable GUI state
+            key, plan = self._plan_entry()
+            operation = self.current_operation()
+            original = self.original_image
+            results, options = self.results, self.run_options()
+            # update() already looked in the cache, so go straight to rendering
+            self.scheduler.submit(lambda should_stop: results.compute(original, key, plan,
+                                                                      should_stop=should_stop, **options),
+                                  lambda result: self.finish_update(result, operation),
+                                  self.render_failed)
+        except Exception as e:
+            self.render_failed(e)
+    
+    def ensure_full_render(self):
+        """Make filtered_image current before it is exported"""
+        if self.needs_full_render:
+            index = self._history_index
+            self.cancel_render()
+            if index is not None:
+                self.filtered_image = self.history.image_at(index)
+                self.show_image()
+            else:
+                self.finish_update(self.apply_filter(self.original_image), self.current_operation())
+    
+    def finish_update(self, filtered_image, operation):
+        """Take a finished render: record it in history and display it"""
+        try:
+            self.filtered_image = filtered_image
+            self.preview_image = None
+            self.needs_full_render = False
             
-            # Add to history if image changed
-            if self.history_position < 0 or not np.array_equal(self.filtered_image, self.history[self.history_position]):
-                # Truncate history if we're not at the end
-                if self.history_position < len(self.history) - 1:
-                    self.history = self.history[:self.history_position + 1]
-                
-                # Add new state to history
-                self.history.append(self.filtered_image.copy())
-                self.history_position = len(self.history) - 1
-                
-                print(f"Added to history. Position: {self.history_position}, Total states: {len(self.history)}")
+            # Add to history if the operation changed
+            if self.history.record(operation, self.filtered_image):
+                print(f"Added to history. Position: {self.history.position}, Total states: {len(self.history)}, "
+                      f"Keyframe bytes: {self.history.nbytes}")
             
             # Update display
             self.show_image()
             
         except Exception as e:
-            print(f"Error in update: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            # Revert to original image if error occurs
-            self.filtered_image = self.original_image.copy()
-            self.show_image()
+            self.render_failed(e)
+    
+    def render_failed(self, error):
+        """Revert to the original image when a render fails"""
+        print(f"Error in update: {str(error)}")
+        import traceback
+        traceback.print_exception(type(error), error, error.__traceback__)
+        self.preview_image = None
+        self.needs_full_render = False
+        self.filtered_image = self.original_image
+        self.show_image()
+    
+    def cancel_render(self):
+        """Forget any render still in flight so it cannot overwrite the current state"""
+        if self._refine_id is not None:
+            self.window.after_cancel(self._refine_id)
+            self._refine_id = None
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+        self.preview_image = None
+        self.needs_full_render = False
+        self._history_index = None
+    
+    def close(self):
+        """Stop background rendering for this image"""
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+        self.strips.shutdown()
+        if self.surface is not None:
+            self.surface.destroy()
+            self.surface = None
+        self.history.clear()
     
     def create_scrollable_frame(self, parent, row, column):
         """Create a frame with scrollbars"""
@@ -287,6 +317,64 @@ class ImageCap:
         
         return scrollable_frame
     
+    def get_display_size(self):
+        """Size each image is shown at, fitting both side by side in the window"""
+        # Calculate display size while maintaining aspect ratio
+        window_width = self.window.winfo_width() - 400  # Account for sidebar and padding
+        window_height = self.window.winfo_height() - 300  # Account for top elements and padding
+        
+        # Calculate scaling factor to fit window while maintaining aspect ratio
+        width_ratio = window_width / (2 * self.original_size[0])  # Divide by 2 for side-by-side display
+        height_ratio = window_height / self.original_size[1]
+        scale_factor = min(width_ratio, height_ratio, self.zoom_factor)
+        
+        return (max(1, int(self.original_size[0] * scale_factor)),
+                max(1, int(self.original_size[1] * scale_factor)))
+    
+    def get_proxy(self):
+        """Original image downscaled to display size, cached until either changes"""
+        size = self.get_display_size()
+        key = (id(self.original_image), size)
+        if self._proxy_key != key:
+            self._proxy = cv2.resize(self.original_image, size, interpolation=cv2.INTER_AREA)
+            self._proxy_key = key
+        return self._proxy
+    
+    def get_display_surface(self):
+        """Find the image frames once and build the persistent display surface on them"""
+        if self.surface is not None:
+            return self.surface
+        
+        # Find the display frames first
+        display_frame = None
+        original_frame = None
+        filtered_frame = None
+        
+        # Find display frame
+        for child in self.window.winfo_children():
+            if isinstance(child, ttk.Frame) and str(child).endswith('display_frame'):
+                display_frame = child
+                break
+        
+        if not display_frame:
+            print("Could not find display frame")
+            return None
+            
+        # Find image frames
+        for child in display_frame.winfo_children():
+            if isinstance(child, ttk.LabelFrame):
+                if "Original Image" in str(child.cget("text")):
+                    original_frame = child
+                elif "Filtered Image" in str(child.cget("text")):
+                    filtered_frame = child
+        
+        if not original_frame or not filtered_frame:
+            print("Could not find image frames")
+            return None
+        
+        self.surface = DisplaySurface(original_frame, filtered_frame)
+        return self.surface
+    
     def show_image(self):
         """Display both original and filtered images side by side with scrollbars"""
         if not hasattr(self, 'original_image') or not hasattr(self, 'filtered_image'):
@@ -294,77 +382,13 @@ class ImageCap:
             return
             
         try:
-            # Find the display frames first
-            display_frame = None
-            original_frame = None
-            filtered_frame = None
-            
-            # Find display frame
-            for child in self.window.winfo_children():
-                if isinstance(child, ttk.Frame) and str(child).endswith('display_frame'):
-                    display_frame = child
-                    break
-            
-            if not display_frame:
-                print("Could not find display frame")
-                return
-                
-            # Find image frames
-            for child in display_frame.winfo_children():
-                if isinstance(child, ttk.LabelFrame):
-                    if "Original Image" in str(child.cget("text")):
-                        original_frame = child
-                    elif "Filtered Image" in str(child.cget("text")):
-                        filtered_frame = child
-            
-            if not original_frame or not filtered_frame:
-                print("Could not find image frames")
+            surface = self.get_display_surface()
+            if surface is None:
                 return
-                
-            # Calculate display size while maintaining aspect ratio
-            window_width = self.window.winfo_width() - 400  # Account for sidebar and padding
-            window_height = self.window.winfo_height() - 300  # Account for top elements and padding
-            
-            # Calculate scaling factor to fit window while maintaining aspect ratio
-            width_ratio = window_width / (2 * self.original_size[0])  # Divide by 2 for side-by-side display
-            height_ratio = window_height / self.original_size[1]
-            scale_factor = min(width_ratio, height_ratio, self.zoom_factor)
-            
-            display_size = (int(self.original_size[0] * scale_factor),
-                           int(self.original_size[1] * scale_factor))
-            
-            # Process original image
-            original_pil = PIL.Image.fromarray(self.original_image)
-            original_pil = original_pil.resize(display_size, PIL.Image.LANCZOS)
-            self.original_photo = PIL.ImageTk.PhotoImage(image=original_pil)
-            
-            # Process filtered image
-            filtered_pil = PIL.Image.fromarray(self.filtered_image)
-            filtered_pil = filtered_pil.resize(display_size, PIL.Image.LANCZOS)
-            self.filtered_photo = PIL.ImageTk.PhotoImage(image=filtered_pil)
-            
-            # Clear existing content
-            for frame in [original_frame, filtered_frame]:
-                for widget in frame.winfo_children():
-                    widget.destroy()
             
-            # Create simple labels for images
-            original_label = ttk.Label(original_frame, image=self.original_photo)
-            original_label.image = self.original_photo  # Keep a reference
-            original_label.pack(expand=True, fill="both", padx=5, pady=5)
-            
-            filtered_label = ttk.Label(filtered_frame, image=self.filtered_photo)
-            filtered_label.image = self.filtered_photo  # Keep a reference
-            filtered_label.pack(expand=True, fill="both", padx=5, pady=5)
-            
-            # Store the labels
-            self.original_label = original_label
-            self.filtered_label = filtered_label
-            
-            # Configure minimum size for frames
-            min_size = max(display_size[0], display_size[1])
-            original_frame.configure(width=min_size, height=min_size)
-            filtered_frame.configure(width=min_size, height=min_size)
+            # A preview is already rendered at display size
+            shown = self.preview_image if self.preview_image is not None else self.filtered_image
+            surface.show(self.original_image, shown, self.get_display_size())
             
             print("Images displayed successfully")
                 
@@ -393,9 +417,10 @@ class ImageCap:
                     
                 print(f"Image shape: {self.original_image.shape}")
                 
-                # Convert BGR to RGB
+                # Convert BGR to RGB; read-only, so every render can share it without copying
                 self.original_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB)
-                self.filtered_image = self.original_image.copy()
+                self.original_image.flags.writeable = False
+                self.filtered_image = self.original_image
                 
                 # Store original size and set initial zoom
                 self.original_size = (self.original_image.shape[1], self.original_image.shape[0])
@@ -404,19 +429,11 @@ class ImageCap:
                 print(f"Original size: {self.original_size}")
                 
                 # Initialize history
-                self.history = [self.original_image.copy()]
-                self.history_position = 0
+                self.history.reset(Pipeline([]).key(), self.filtered_image)
                 
                 # Initialize filter parameters if not already set
                 if not hasattr(self, 'filter_params'):
-                    self.filter_params = {
-                        'intensity': 1.0,
-                        'threshold': 127,
-                        'temperature': 0,
-                        'saturation': 1.0,
-                        'vignette': 0.5,
-                        'blur_radius': 5
-                    }
+                    self.filter_params = dict(DEFAULT_PARAMS)
                 
                 print("Displaying image...")
                 # Show initial image
@@ -439,6 +456,7 @@ class ImageCap:
         """Save the current filtered image"""
         try:
             if hasattr(self, 'filtered_image') and self.filtered_image is not None:
+                self.ensure_full_render()
                 save_path = tkinter.filedialog.asksaveasfilename(
                     defaultextension=".png",
                     filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
@@ -455,24 +473,58 @@ class ImageCap:
     
     def undo(self):
         """Undo the last filter operation"""
-        if self.history_position > 0:
-            self.history_position -= 1
-            self.filtered_image = self.history[self.history_position].copy()
-            self.show_image()
+        if self.history.can_undo():
+            self.show_history(self.history.position - 1)
     
     def redo(self):
         """Redo the last undone filter operation"""
-        if self.history_position < len(self.history) - 1:
-            self.history_position += 1
-            self.filtered_image = self.history[self.history_position].copy()
+        if self.history.can_redo():
+            self.show_history(self.history.position + 1)
+    
+    def show_history(self, index):
+        """Move to history entry index and show its frame
+
+        A frame with no keyframe or cached result is rebuilt in the
+        background like any other render, with a preview meanwhile.
+        """
+        self.cancel_render()
+        self.history.position = index
+        operation = self.history.entries[index].operation
+        image = self.history.stored_image(index)
+        if image is None:
+            image = self.results.lookup(self.original_image, operation)
+        if image is None and self.scheduler is None:
+            image = self.history.image_at(index)
+        if image is not None:
+            self.history.remember(index, image)
+            self.filtered_image = image
             self.show_image()
+            return
+        
+        self.needs_full_render = True
+        self._history_index = index
+        self.show_preview(operation)
+        original, results, options = self.original_image, self.results, self.run_options()
+        self.scheduler.submit(lambda should_stop: results.compute(original, operation,
+                                                                  should_stop=should_stop, **options),
+                              lambda result: self.finish_history(index, result),
+                              self.render_failed)
+    
+    def finish_history(self, index, image):
+        """Take a rebuilt history frame and display it"""
+        self.history.remember(index, image)
+        self.filtered_image = image
+        self.preview_image = None
+        self.needs_full_render = False
+        self._history_index = None
+        self.show_image()
     
     def reset(self):
         """Reset to original image"""
         if hasattr(self, 'original_image'):
-            self.filtered_image = self.original_image.copy()
-            self.history = [self.filtered_image.copy()]
-            self.history_position = 0
+            self.cancel_render()
+            self.filtered_image = self.original_image
+            self.history.reset(Pipeline([]).key(), self.filtered_image)
             self.zoom_factor = 1.0
             self.show_image()
     
@@ -492,4 +544,83 @@ class ImageCap:
             height_ratio = window_height / img_height
             
             self.zoom_factor = min(width_ratio, height_ratio)
-            self.show_image()
\ No newline at end of file
+            self.show_image()
+
+
+class LiveCap(ImageCap):
+    """ImageCap for a camera or video file, filtered live (see live_capture.py)
+
+    Filters and parameters are set as for an image, but update() hands the
+    new plan to the worker instead of rendering. The newest result is shown
+    target_fps times a second. There is no undo history, as every frame is new.
+    """
+    def __init__(self, window, source, target_fps=LIVE_TARGET_FPS):
+        super().__init__(window)
+        self.target_fps = target_fps
+        self.live = LiveProcessor(source, self.get_plan(), strips=self.strips)
+        self.original_size = self.live.size
+        self.source_name = f"Camera {source}" if isinstance(source, int) else os.path.basename(source)
+        self.shown = RateMeter()
+        # Number of the frame on screen, so the display redraws both sides for each new one
+        self.frame_number = 0
+        self._stats_time = 0.0
+        self._poll_id = None
+        self.poll()
+    
+    def update(self, refine_delay=0):
+        """Filter the next frames with the current filters"""
+        self.live.set_plan(self.get_plan())
+    
+    def poll(self):
+        """Show the newest filtered frame, if there is one, and schedule the next poll"""
+        self._poll_id = None
+        started = time.perf_counter()
+        try:
+            frame = self.live.results.take(0)
+            if frame is not None:
+                self.original_image, self.filtered_image = frame
+                self.frame_number += 1
+                surface = self.get_display_surface()
+                if surface is not None:
+                    # Shrink on the Tk thread with OpenCV, which is far cheaper than PIL's LANCZOS
+                    size = self.get_display_size()
+                    surface.show(cv2.resize(self.original_image, size, interpolation=cv2.INTER_AREA),
+                                 cv2.resize(self.filtered_image, size, interpolation=cv2.INTER_AREA), size,
+                                 frame_number=self.frame_number)
+                self.shown.tick()
+            elif self.live.results.closed:
+                # The source ended or failed; keep the last frame on screen
+                self.show_stats(" - ended")
+                return
+            
+            if time.perf_counter() - self._stats_time >= LIVE_STATS_INTERVAL:
+                self.show_stats()
+        except Exception as e:
+            print(f"Error displaying live frame: {str(e)}")
+            import traceback
+            traceback.print_exc()
+        # Time spent drawing counts against the frame interval
+        delay = 1.0 / self.target_fps - (time.perf_counter() - started)
+        self._poll_id = self.window.after(max(1, int(delay * 1000)), self.poll)
+    
+    def show_stats(self, suffix=""):
+        """Show the frame rates at each step, and how many frames were dropped there, in the window title"""
+        self._stats_time = time.perf_counter()
+        stats = self.live.stats()
+        # captured = processed + dropped, and processed = shown + not shown
+        self.window.title(f"GREAT MATES - Computer Science - {self.source_name} - "
+                          f"{stats['captured_fps']:.1f} fps captured, {stats['processed_fps']:.1f} processed "
+                          f"({stats['dropped_fps']:.1f} dropped), {self.shown.rate():.1f} shown "
+                          f"({stats['display_dropped_fps']:.1f} not shown){suffix}")
+    
+    def reset(self):
+        """Reset the zoom; the live frames themselves have nothing to reset"""
+        self.zoom_factor = 1.0
+    
+    def close(self):
+        """Stop capturing, processing and displaying"""
+        if self._poll_id is not None:
+            self.window.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.live.stop()
+        super().close()
@@ -0,0 +1,243 @@
+"""Live filtering of a camera or a video file.
+
+Frames are handed from thread to thread through LatestFrame slots, which
+hold only the newest frame:
+
+    capture  reads cv2.VideoCapture as fast as the source delivers
+    worker   filters the newest captured frame with the current plan
+    display  the GUI takes the newest result at its own target FPS
+
+A captured frame the worker has not taken by the time the next one arrives
+is dropped, so a slow filter chain lowers the processed frame rate instead
+of building up latency. Video files are read at their own frame rate, like
+a camera. With realtime=False the capture thread instead waits for the
+worker, so every frame of a file is processed and none dropped, which
+measures the throughput of a plan (see benchmark()).
+"""
+import time
+from collections import deque
+from threading import Condition, Lock, Thread
+import cv2
+from buffer_pool import BufferPool
+
+# Seconds the rates in LiveProcessor.stats() are averaged over
+RATE_WINDOW = 2.0
+
+# Frame rate assumed for files that do not report one
+DEFAULT_FILE_FPS = 30.0
+
+# How long stop() waits for the threads, in seconds
+STOP_TIMEOUT = 2.0
+
+
+class LatestFrame:
+    """Single-slot buffer: put() replaces a frame that was not taken yet"""
+    def __init__(self):
+        self._cond = Condition()
+        self._frame = None
+        self._fresh = False
+        self.closed = False
+
+    def put(self, frame, wait=False):
+        """Store frame; True if it replaced one that was never taken
+
+        With wait, block until the previous frame was taken instead.
+        """
+        with self._cond:
+            if wait:
+                self._cond.wait_for(lambda: not self._fresh or self.closed)
+            dropped = self._fresh
+            self._frame = frame
+            self._fresh = True
+            self._cond.notify_all()
+            return dropped
+
+    def take(self, timeout=None):
+        """The newest frame, waiting up to timeout seconds for one not taken before
+
+        Returns None on timeout, or once the slot is closed and drained.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._fresh or self.closed, timeout)
+            if not self._fresh:
+                return None
+            self._fresh = False
+            self._cond.notify_all()
+            return self._frame
+
+    def close(self):
+        """Wake every waiter; no new frames are expected"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class RateMeter:
+    """Count of events and their rate per second over the last RATE_WINDOW seconds"""
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self.count = 0
+        self._times = deque()
+        self._start = time.perf_counter()
+        self._lock = Lock()
+
+    def tick(self):
+        now = time.perf_counter()
+        with self._lock:
+            self.count += 1
+            self._times.append(now)
+            self._trim(now)
+
+    def rate(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._trim(now)
+            # Until a full window has passed, average over the time so far
+            span = min(self.window, now - self._start)
+            return len(self._times) / span if span > 0 else 0.0
+
+    def _trim(self, now):
+        while self._times and self._times[0] < now - self.window:
+            self._times.popleft()
+
+
+class LiveProcessor:
+    """Capture thread and filter worker for one video source
+
+    source is a camera index (int) or the path of a video file. plan is the
+    ExecutionPlan applied to each frame, or None to pass frames through;
+    set_plan() swaps it while running. Results are (original, filtered) RGB
+    frame pairs, taken with results.take().
+    """
+    def __init__(self, source, plan=None, realtime=True, strips=None):
+        self.source = source
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise ValueError(f"Could not open video source: {source}")
+        self.is_file = not isinstance(source, int)
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.source_fps = fps if fps > 0 else DEFAULT_FILE_FPS
+        self.size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.realtime = realtime
+        self.plan = plan
+        self.strips = strips
+        # Live frames all have one size, so two buffers serve every stage of every frame
+        self.buffers = BufferPool()
+
+        self.frames = LatestFrame()
+        self.results = LatestFrame()
+        self.captured = RateMeter()
+        self.processed = RateMeter()
+        self.dropped = RateMeter()
+        # Processed frames replaced before the display took them
+        self.display_dropped = RateMeter()
+        self.error = None
+        self.running = True
+        self._started = time.perf_counter()
+
+        self._threads = [Thread(target=self._capture_loop, daemon=True),
+                         Thread(target=self._process_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def set_plan(self, plan):
+        """Filter frames from now on with plan; the frame being processed keeps the old one"""
+        self.plan = plan
+
+    def _capture_loop(self):
+        # Files are paced to their frame rate; cameras deliver at theirs
+        interval = 1.0 / self.source_fps if self.is_file and self.realtime else 0.0
+        next_time = time.perf_counter()
+        try:
+            while self.running:
+                ok, frame = self.capture.read()
+                if not ok:
+                    break
+                self.captured.tick()
+                if self.frames.put(frame, wait=not self.realtime):
+                    self.dropped.tick()
+                if interval:
+                    next_time += interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Fell behind; carry on from now rather than reading a burst
+                        next_time = time.perf_counter()
+        except Exception as e:
+            self.error = e
+            print(f"Error capturing frames: {str(e)}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            self.capture.release()
+            self.frames.close()
+
+    def _process_loop(self):
+        try:
+            while self.running:
+                frame = self.frames.take()
+                if frame is None:
+                    break
+                original = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # Read-only, like an opened image, so stages never write into it
+                original.flags.writeable = False
+                plan = self.plan
+                filtered = original
+                if plan is not None:
+                    filtered = plan.run(original, strips=self.strips, buffers=self.buffers)
+                self.processed.tick()
+                if self.results.put((original, filtered)):
+                    self.display_dropped.tick()
+        except Exception as e:
+            self.error = e
+            print(f"Error processing frames: {str(e)}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            # Also releases a capture thread waiting for this one
+            self.frames.close()
+            self.results.close()
+
+    def stats(self):
+        """Frame counts, and frames per second over the last RATE_WINDOW seconds
+
+        Captured frames are either processed or dropped before processing;
+        processed frames are either taken from results or display_dropped.
+        """
+        return {'captured': self.captured.count,
+                'processed': self.processed.count,
+                'dropped': self.dropped.count,
+                'display_dropped': self.display_dropped.count,
+                'captured_fps': self.captured.rate(),
+                'processed_fps': self.processed.rate(),
+                'dropped_fps': self.dropped.rate(),
+                'display_dropped_fps': self.display_dropped.rate(),
+                'elapsed': time.perf_counter() - self._started}
+
+    def stop(self):
+        """Stop capturing and processing, and wait for both threads"""
+        self.running = False
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            thread.join(STOP_TIMEOUT)
+        self.buffers.clear()
+
+
+def benchmark(source, plan, realtime=False, strips=None):
+    """Filter every frame of a video file with plan and return the final stats()
+
+    With realtime=True the file plays at its own frame rate and frames the
+    plan cannot keep up with are dropped, as from a camera.
+    """
+    live = LiveProcessor(source, plan, realtime=realtime, strips=strips)
+    try:
+        while live.results.take() is not None:
+            pass
+        if live.error is not None:
+            raise live.error
+        return live.stats()
+    finally:
+        live.stop()
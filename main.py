@@ -3,10 +3,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import time
 import os
+import threading
+import queue
 from image_processing import *
 from advanced_filters import AdvancedFilters
-from batch_processor import BatchProcessor
-import PIL
+from batch_processor import BatchProcessor, CancelToken
+from filter_pipeline import FILTER_REGISTRY
+import PIL.Image
+import PIL.ImageTk
 
 # create folder directory to save images
 folder = r"\images"
@@ -225,6 +229,8 @@ class FiltrawyApp:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open Image", command=self.select_image)
+        file_menu.add_command(label="Open Camera", command=self.select_camera)
+        file_menu.add_command(label="Open Video...", command=self.select_video)
         
         file_menu.add_separator()
         file_menu.add_command(label="Save Image", command=self.save_image)
@@ -256,7 +262,8 @@ class FiltrawyApp:
         # Create submenus for filter categories
         categories = {
             "Basic": ['color', 'gray', 'threshold'],
-            "Enhancement": ['increaseContrast', 'decreaseContrast', 'logTransformation'],
+            "Enhancement": ['increaseContrast', 'decreaseContrast', 'logTransformation',
+                            'powerLowEnhancement', 'negativeEnhancement'],
             "Effects": ['sepia', 'vintage', 'vignette']
         }
         
@@ -343,8 +350,6 @@ class FiltrawyApp:
                 'vignette': self.filter_params['vignette'].get(),
                 'blur_radius': self.filter_params['blur_radius'].get()
             })
-            # Update the image
-            self.img.update()
     
     def save_image(self):
         if hasattr(self.img, 'save_image'):
@@ -369,6 +374,7 @@ class FiltrawyApp:
         )
         if file_path:
             try:
+                self.img.ensure_full_render()
                 cv2.imwrite(file_path, cv2.cvtColor(self.img.filtered_image, cv2.COLOR_RGB2BGR))
                 messagebox.showinfo("Success", "Image saved successfully!")
             except Exception as e:
@@ -413,7 +419,12 @@ class FiltrawyApp:
 4. Batch Processing:
    - Use 'File > Batch Process' to apply filters to multiple images
    - Select input and output folders
-   - Choose a filter to apply to all images"""
+   - Choose a filter to apply to all images
+
+5. Live camera or video:
+   - Use 'File > Open Camera' or 'File > Open Video...'
+   - Filters and sliders apply to the live frames
+   - The title bar shows the frame rates; frames the filters cannot keep up with are dropped"""
         
         messagebox.showinfo("Quick Start Guide", quick_start_text)
     
@@ -452,6 +463,10 @@ Ctrl+0 : Fit to Window"""
         ttk.Button(button_container, text="Open Image", 
                   style="Action.TButton",
                   command=self.select_image).pack(side="left", padx=5)
+        
+        ttk.Button(button_container, text="Open Camera",
+                  style="Action.TButton",
+                  command=self.select_camera).pack(side="left", padx=5)
       
         ttk.Button(button_container, text="Batch Process",
                   style="Action.TButton",
@@ -476,6 +491,10 @@ Ctrl+0 : Fit to Window"""
                   style="Filter.TButton").pack(pady=2)
         ttk.Button(self.filter_frame, text="Log Transform", command=lambda: self.apply_filter('logTransformation'),
                   style="Filter.TButton").pack(pady=2)
+        ttk.Button(self.filter_frame, text="Power Law", command=lambda: self.apply_filter('powerLowEnhancement'),
+                  style="Filter.TButton").pack(pady=2)
+        ttk.Button(self.filter_frame, text="Negative", command=lambda: self.apply_filter('negativeEnhancement'),
+                  style="Filter.TButton").pack(pady=2)
         
         # Blur filters
         ttk.Label(self.filter_frame, text="Blur", style="Category.TLabel").pack(fill="x", pady=(10,0))
@@ -485,6 +504,10 @@ Ctrl+0 : Fit to Window"""
                   style="Filter.TButton").pack(pady=2)
         ttk.Button(self.filter_frame, text="Average Blur", command=lambda: self.apply_filter('average'),
                   style="Filter.TButton").pack(pady=2)
+        ttk.Button(self.filter_frame, text="Min Filter", command=lambda: self.apply_filter('min'),
+                  style="Filter.TButton").pack(pady=2)
+        ttk.Button(self.filter_frame, text="Max Filter", command=lambda: self.apply_filter('max'),
+                  style="Filter.TButton").pack(pady=2)
         
         # Edge Detection
         ttk.Label(self.filter_frame, text="Edge Detection", style="Category.TLabel").pack(fill="x", pady=(10,0))
@@ -544,6 +567,10 @@ Thank you for using Filtrawy!"""
     
     def select_image(self):
         try:
+            # Stop background rendering for the previous image
+            if self.img is not None:
+                self.img.close()
+            
             # Create new ImageCap instance
             self.img = ImageCap(self.window)
             
@@ -557,11 +584,30 @@ Thank you for using Filtrawy!"""
             messagebox.showerror("Error", f"Failed to open image: {str(e)}")
     
     def select_camera(self):
+        self.start_live(0)
+    
+    def select_video(self):
+        video_path = filedialog.askopenfilename(
+            filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv *.webm"), ("All files", "*.*")]
+        )
+        if video_path:
+            self.start_live(video_path)
+    
+    def start_live(self, source):
+        """Filter a camera (index) or video file (path) live with the chosen filters"""
         try:
-        
-            self.window.title("GREAT MATES - Computer Science - Camera Feed")
+            # Stop background rendering or the previous live source
+            if self.img is not None:
+                self.img.close()
+                self.img = None
+            
+            self.img = LiveCap(self.window, source)
+            self.window.title(f"GREAT MATES - Computer Science - {self.img.source_name}")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to open camera: {str(e)}")
+            print(f"Error in start_live: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            messagebox.showerror("Error", f"Failed to open video source: {str(e)}")
     
     def apply_filter(self, filter_name):
         if self.img is None:
@@ -573,7 +619,8 @@ Thank you for using Filtrawy!"""
             self.img.all_filters = {f: False for f in [
                 'color', 'gray', 'threshold',
                 'increaseContrast', 'decreaseContrast', 'logTransformation',
-                'gauss', 'median', 'average',
+                'powerLowEnhancement', 'negativeEnhancement',
+                'gauss', 'median', 'average', 'min', 'max',
                 'sobel', 'laplace', 'prewitt',
                 'vignette', 'temperature', 'saturation',
                 'unsharp', 'histogramEqualization', 'sepia', 'vintage'
@@ -591,7 +638,7 @@ Thank you for using Filtrawy!"""
                     'saturation': self.filter_params['saturation'].get(),
                     'vignette': self.filter_params['vignette'].get(),
                     'blur_radius': self.filter_params['blur_radius'].get()
-                })
+                }, refresh=False)
             
             # Apply filter
             self.img.update()
@@ -611,22 +658,35 @@ Thank you for using Filtrawy!"""
         if not output_dir:
             return
         
-        self.batch_processor = BatchProcessor(input_dir, output_dir)
-        
         # Create dialog for batch processing options
         dialog = tk.Toplevel(self.window)
         dialog.title("Batch Processing")
         dialog.geometry("300x400")
         
-        ttk.Label(dialog, text="Select Filter:").pack(pady=5)
-        filter_var = tk.StringVar(value="sepia")
-        filter_combo = ttk.Combobox(dialog, textvariable=filter_var, values=fil)
-        filter_combo.pack(pady=5)
-        
-        ttk.Button(dialog, text="Start Processing",
-                  command=lambda: self.run_batch_process(filter_var.get(), dialog)).pack(pady=10)
+        ttk.Label(dialog, text="Select Filters:").pack(pady=5)
+        # Several filters give one output folder each, from a single read of every image
+        # Only registered filters can be batch processed (denoise, hdr and tilt_shift are not)
+        batch_filters = [name for name in fil if name in FILTER_REGISTRY]
+        filter_list = tk.Listbox(dialog, selectmode='multiple', exportselection=False, height=12)
+        for name in batch_filters:
+            filter_list.insert('end', name)
+        filter_list.selection_set(batch_filters.index('sepia'))
+        filter_list.pack(pady=5)
+        
+        recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dialog, text="Include subfolders", variable=recursive_var).pack(pady=5)
+        
+        def start():
+            filters = [batch_filters[index] for index in filter_list.curselection()]
+            if not filters:
+                messagebox.showwarning("Warning", "Please select at least one filter")
+                return
+            self.batch_processor = BatchProcessor(input_dir, output_dir, recursive=recursive_var.get())
+            self.run_batch_process(filters, dialog)
+        
+        ttk.Button(dialog, text="Start Processing", command=start).pack(pady=10)
     
-    def run_batch_process(self, filter_name, dialog):
+    def run_batch_process(self, filters, dialog):
         dialog.destroy()
         
         # Show progress dialog
@@ -634,23 +694,86 @@ Thank you for using Filtrawy!"""
         progress_dialog.title("Processing Images")
         progress_dialog.geometry("300x150")
         
-        ttk.Label(progress_dialog, text="Processing images...").pack(pady=20)
-        progress_bar = ttk.Progressbar(progress_dialog, mode='indeterminate')
+        status_label = ttk.Label(progress_dialog, text="Processing images...")
+        status_label.pack(pady=20)
+        progress_bar = ttk.Progressbar(progress_dialog, mode='determinate')
         progress_bar.pack(fill='x', padx=20)
-        progress_bar.start()
+        
+        # The batch runs on its own thread; results come back through a queue
+        # that the mainloop polls, so the editor stays responsive meanwhile
+        cancel_token = CancelToken()
+        updates = queue.Queue()
+        processor = self.batch_processor
+        
+        def cancel():
+            cancel_token.cancel()
+            cancel_button.configure(state='disabled')
+            status_label.configure(text="Cancelling...")
+        
+        cancel_button = ttk.Button(progress_dialog, text="Cancel", command=cancel)
+        cancel_button.pack(pady=10)
+        progress_dialog.protocol("WM_DELETE_WINDOW", cancel)
         
         def process():
-            results = self.batch_processor.process_directory(filter_name)
+            try:
+                if len(filters) == 1:
+                    stream = processor.iter_directory(filters[0], cancel_token=cancel_token)
+                else:
+                    stream = processor.iter_presets({name: name for name in filters},
+                                                    cancel_token=cancel_token)
+                for result in stream:
+                    updates.put(result)
+            except Exception as e:
+                print(f"Error in batch processing: {str(e)}")
+                import traceback
+                traceback.print_exc()
+            finally:
+                updates.put(None)
+        
+        results = []
+        
+        def poll():
+            while True:
+                try:
+                    result = updates.get_nowait()
+                except queue.Empty:
+                    break
+                
+                if result is None:
+                    finish()
+                    return
+                
+                results.append(result)
+                if result.total is None:
+                    # Still finding files, so there is no total to show progress against
+                    if not cancel_token.cancelled:
+                        status_label.configure(text=f"Processed {result.done} images\n"
+                                                    f"Looking for more...")
+                    continue
+                progress_bar.configure(maximum=result.total, value=result.done)
+                if not cancel_token.cancelled and result.eta is not None:
+                    eta = int(round(result.eta))
+                    status_label.configure(text=f"Processed {result.done} of {result.total} images\n"
+                                                f"About {eta // 60}:{eta % 60:02d} left")
+            
+            self.window.after(100, poll)
+        
+        def finish():
             progress_dialog.destroy()
             
             # Show results
-            success = sum(1 for _, status in results if status)
-            messagebox.showinfo("Batch Processing Complete",
-                              f"Processed {len(results)} images\n"
+            skipped = sum(1 for result in results if result.skipped)
+            success = sum(1 for result in results if result.ok) - skipped
+            title = "Batch Processing Cancelled" if cancel_token.cancelled else "Batch Processing Complete"
+            messagebox.showinfo(title,
+                              f"Processed {len(results) - skipped} images\n"
                               f"Successful: {success}\n"
-                              f"Failed: {len(results) - success}")
+                              f"Failed: {len(results) - skipped - success}\n"
+                              f"Already up to date: {skipped}\n\n"
+                              f"{processor.stage_report()}")
         
-        self.window.after(100, process)
+        threading.Thread(target=process, daemon=True).start()
+        self.window.after(100, poll)
 
 if __name__ == '__main__':
     root = tk.Tk()
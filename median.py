@@ -0,0 +1,55 @@
+"""Median filter split into strips that run in parallel.
+
+For 8-bit kernels above 5x5, cv2.medianBlur already uses the constant-time
+histogram algorithm (Perreault & Hebert), but it runs on a single thread.
+Here the frame is cut into horizontal strips, each read with radius extra
+rows above and below so its own rows come out exactly as in a whole-frame
+call, and the strips are filtered on a thread pool (OpenCV releases the
+GIL while it works). Strips are cut by strip_processing.split_rows. Under
+a StripExecutor or TiledExecutor the median stage calls cv2.medianBlur on
+each strip or tile directly instead, as those already run in parallel.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import cv2
+import numpy as np
+from strip_processing import split_rows
+
+# One pool per thread count, created on first use and kept for the process
+_pools = {}
+_pool_lock = Lock()
+
+
+def _get_pool(threads):
+    with _pool_lock:
+        pool = _pools.get(threads)
+        if pool is None:
+            pool = _pools[threads] = ThreadPoolExecutor(max_workers=threads)
+        return pool
+
+
+def median_blur(image, radius, threads=None, out=None):
+    """Same result as cv2.medianBlur(image, 2 * radius + 1), filtered in parallel strips
+
+    threads defaults to cv2.getNumThreads(), so a process that limited
+    OpenCV to one thread (like the batch worker processes) stays serial.
+    The result goes into out if given.
+    """
+    ksize = 2 * radius + 1
+    if threads is None:
+        threads = cv2.getNumThreads()
+    rows = image.shape[0]
+    strips = split_rows(rows, threads)
+    if threads <= 1 or len(strips) == 1:
+        return cv2.medianBlur(image, ksize, dst=out)
+
+    result = out if out is not None else np.empty_like(image)
+
+    def run(strip):
+        top, bottom = strip
+        start, stop = max(0, top - radius), min(rows, bottom + radius)
+        result[top:bottom] = cv2.medianBlur(image[start:stop], ksize)[top - start:bottom - start]
+
+    # list() waits for every strip and re-raises the first error
+    list(_get_pool(threads).map(run, strips))
+    return result
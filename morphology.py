@@ -0,0 +1,93 @@
+"""Min and max filters (erosion and dilation) whose cost stops growing with the radius.
+
+A rectangular structuring element is separable: the min over a box is the
+min over its columns of the min over its rows, so a rectangle is filtered
+as two 1-D passes. Each pass picks its algorithm by radius:
+
+    cv2.erode / cv2.dilate with a 1-D kernel, SIMD but O(radius) per pixel
+    van Herk/Gil-Werman, O(1) per pixel: the line is cut into blocks of
+    the window width w, a running min is taken forwards (g) and backwards
+    (h) inside each block, and every window is min(h[x], g[x + w - 1])
+
+Rows are filtered as columns of the transposed image, where the blocks are
+contiguous. Other element shapes go straight to OpenCV. Every path matches
+cv2.erode / cv2.dilate with the default border (pixels outside the image
+are ignored).
+"""
+import cv2
+import numpy as np
+
+ELEMENT_SHAPES = {'rect': cv2.MORPH_RECT, 'ellipse': cv2.MORPH_ELLIPSE, 'cross': cv2.MORPH_CROSS}
+
+# Radius from which a column pass uses van Herk/Gil-Werman instead of OpenCV
+VHGW_COLUMN_RADIUS = 48
+
+# Same for a row pass, which pays for two transposes
+VHGW_ROW_RADIUS = 128
+
+# op: (OpenCV function, numpy ufunc, value that never wins)
+_OPS = {'min': (cv2.erode, np.minimum, 255),
+        'max': (cv2.dilate, np.maximum, 0)}
+
+
+def _vhgw_columns(image, radius, ufunc, identity):
+    """van Herk/Gil-Werman min or max over 2r+1 rows, for every column"""
+    width = 2 * radius + 1
+    rows = image.shape[0]
+    blocks = -(-(rows + 2 * radius) // width)
+
+    # Pad with the identity so out-of-image rows never win, then cut into blocks
+    forward = np.full((blocks * width,) + image.shape[1:], identity, dtype=image.dtype)
+    forward[radius:radius + rows] = image
+    backward = forward.copy()
+    g = forward.reshape((blocks, width) + image.shape[1:])
+    h = backward.reshape(g.shape)
+    for i in range(1, width):
+        ufunc(g[:, i], g[:, i - 1], out=g[:, i])
+        ufunc(h[:, width - 1 - i], h[:, width - i], out=h[:, width - 1 - i])
+    return ufunc(backward[:rows], forward[width - 1:width - 1 + rows])
+
+
+def _pass(image, radius, op, axis, out=None):
+    if radius <= 0:
+        return image
+    cv_func, ufunc, identity = _OPS[op]
+    if axis == 0:
+        if radius >= VHGW_COLUMN_RADIUS:
+            return _vhgw_columns(image, radius, ufunc, identity)
+        return cv_func(image, np.ones((2 * radius + 1, 1), np.uint8), dst=out)
+    if radius >= VHGW_ROW_RADIUS:
+        return cv2.transpose(_vhgw_columns(cv2.transpose(image), radius, ufunc, identity), dst=out)
+    return cv_func(image, np.ones((1, 2 * radius + 1), np.uint8), dst=out)
+
+
+def rect_rank_filter(image, radius_y, radius_x, op, out=None):
+    """'min' or 'max' over a (2*radius_y+1)x(2*radius_x+1) rectangle, as two 1-D passes
+
+    The result goes into out if given.
+    """
+    if radius_y <= 0 and radius_x <= 0:
+        # Always a new array, as from the other filters
+        return image.copy()
+    if radius_x <= 0:
+        return _pass(image, radius_y, op, 0, out)
+    return _pass(_pass(image, radius_y, op, 0), radius_x, op, 1, out)
+
+
+def rank_filter(image, radius, op, shape='rect', out=None):
+    """'min' (erosion) or 'max' (dilation) over a (2r+1)x(2r+1) structuring element"""
+    if op not in _OPS:
+        raise ValueError(f"Unknown rank filter: {op}")
+    if shape == 'rect':
+        return rect_rank_filter(image, radius, radius, op, out)
+    ksize = 2 * radius + 1
+    element = cv2.getStructuringElement(ELEMENT_SHAPES[shape], (ksize, ksize))
+    return _OPS[op][0](image, element, dst=out)
+
+
+def min_filter(image, radius, shape='rect', out=None):
+    return rank_filter(image, radius, 'min', shape, out)
+
+
+def max_filter(image, radius, shape='rect', out=None):
+    return rank_filter(image, radius, 'max', shape, out)
@@ -0,0 +1,34 @@
+"""Outputs of the leading stages of a plan, so a change late in the chain re-runs only the tail.
+
+ExecutionPlan.run stores the frame after each stage under the keys of the
+stages run so far (each key holds only the parameters that stage reads).
+A later run on the same source resumes after the longest prefix it finds.
+A parameter change therefore invalidates exactly the prefixes that contain
+a stage reading it: moving the vignette slider after a heavy median
+restarts at the vignette. Prefixes are kept per source frame in LRU order
+under a byte budget (see source_cache.py).
+"""
+from source_cache import SourceCache
+
+# Default memory budget for stage outputs, in bytes
+DEFAULT_PREFIX_BUDGET = 256 * 1024 * 1024
+
+
+class PrefixCache(SourceCache):
+    def __init__(self, budget_bytes=DEFAULT_PREFIX_BUDGET):
+        super().__init__(budget_bytes)
+
+    def resume(self, source, prefix_keys):
+        """(stages done, their output) for the longest stored prefix, or (0, None)
+
+        prefix_keys[i] is the key of the first i stages.
+        """
+        for done in range(len(prefix_keys) - 1, 0, -1):
+            result = self.peek(source, prefix_keys[done])
+            if result is not None:
+                with self._lock:
+                    self.hits += 1
+                return done, result
+        with self._lock:
+            self.misses += 1
+        return 0, None
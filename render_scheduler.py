@@ -0,0 +1,106 @@
+"""Background rendering for the GUI with latest-wins cancellation.
+
+Filtering runs on a worker thread. Only the newest request is kept: a request
+that arrives while another is waiting replaces it, and a result that is
+already stale when it finishes is dropped. Results are handed back to the Tk
+mainloop with window.after, so callbacks never run on the worker thread.
+"""
+import threading
+import traceback
+
+
+class RenderScheduler:
+    def __init__(self, window, poll_ms=15):
+        self.window = window
+        self.poll_ms = poll_ms
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._running = False
+        self._done = None
+        self._polling = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        """True while a render is waiting, running or not yet delivered"""
+        with self._condition:
+            return self._pending is not None or self._running or self._done is not None
+
+    def submit(self, job, on_done, on_error=None):
+        """Schedule job(should_stop) and call on_done(result) on the mainloop
+
+        should_stop() turns True as soon as a newer request supersedes this
+        one, so long jobs can bail out early (ExecutionPlan.run checks it
+        between stages).
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, job, on_done, on_error)
+            self._condition.notify()
+        self._start_polling()
+
+    def cancel(self):
+        """Drop the waiting request and any result that has not been delivered yet"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._done = None
+
+    def shutdown(self):
+        """Stop the worker thread once it is idle"""
+        with self._condition:
+            self._closed = True
+            self._generation += 1
+            self._pending = None
+            self._condition.notify()
+
+    def _is_stale(self, generation):
+        return generation != self._generation
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                generation, job, on_done, on_error = self._pending
+                self._pending = None
+                self._running = True
+
+            try:
+                result, error = job(lambda: self._is_stale(generation)), None
+            except Exception as e:
+                traceback.print_exc()
+                result, error = None, e
+
+            with self._condition:
+                self._running = False
+                # Latest wins: anything superseded while running is thrown away
+                if not self._is_stale(generation):
+                    self._done = (result, error, on_done, on_error)
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.window.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        with self._condition:
+            done, self._done = self._done, None
+            active = self._pending is not None or self._running
+
+        if done is not None:
+            result, error, on_done, on_error = done
+            if error is None:
+                on_done(result)
+            elif on_error is not None:
+                on_error(error)
+
+        if active and not self._closed:
+            self.window.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,40 @@
+"""Memo of rendered frames, so revisiting a filter set or parameter value is free.
+
+Results are keyed by the source frame (see source_cache.py) and the
+pipeline key, i.e. the enabled filters plus the parameters they read.
+ImageCap quantises slider values (filter_pipeline.quantize_params) before
+building pipelines, so scrubbing a slider back lands on the same key.
+Frames are kept in LRU order under a byte budget; stats() reports hits,
+misses and evictions.
+"""
+from filter_pipeline import Pipeline
+from source_cache import SourceCache
+
+# Default memory budget for remembered results, in bytes
+DEFAULT_RESULT_BUDGET = 256 * 1024 * 1024
+
+
+class ResultCache(SourceCache):
+    def __init__(self, budget_bytes=DEFAULT_RESULT_BUDGET):
+        super().__init__(budget_bytes)
+
+    def render(self, source, key, plan=None, **options):
+        """Result of pipeline key on source, from the cache or by running plan
+
+        plan defaults to compiling key. options go to ExecutionPlan.run
+        (should_stop, prefixes, strips); the result is None if should_stop()
+        stops the run. Results are read-only.
+        """
+        result = self.lookup(source, key)
+        if result is None:
+            result = self.compute(source, key, plan, **options)
+        return result
+
+    def compute(self, source, key, plan=None, **options):
+        """Run plan on source and remember the result, without looking in the cache first"""
+        if plan is None:
+            plan = Pipeline.from_key(key).compile()
+        result = plan.run(source, **options)
+        if result is not None:
+            self.store(source, key, result)
+        return result
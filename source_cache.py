@@ -0,0 +1,90 @@
+"""LRU cache of arrays computed from a source frame, under a byte budget.
+
+Entries are keyed by the identity of the source array plus a key saying
+what was computed from it. The cache holds only a weak reference to each
+source, so a source's entries are dropped as soon as it is freed and an id
+is never mistaken for a later array's. A source changed in place must be
+passed to invalidate(). Stored arrays are made read-only.
+"""
+from collections import OrderedDict
+from threading import RLock
+import weakref
+
+
+class SourceCache:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        # (id(source), key) -> array, least recently used first
+        self.entries = OrderedDict()
+        # id(source) -> weak reference to the source
+        self._sources = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        # Reentrant: a source freed while the lock is held calls _forget
+        self._lock = RLock()
+
+    def lookup(self, source, key):
+        """The array stored for (source, key), or None"""
+        with self._lock:
+            result = self.peek(source, key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def peek(self, source, key):
+        """Like lookup, but not counted in the hit and miss stats"""
+        entry = (id(source), key)
+        with self._lock:
+            ref = self._sources.get(entry[0])
+            if ref is not None and ref() is source and entry in self.entries:
+                self.entries.move_to_end(entry)
+                return self.entries[entry]
+            return None
+
+    def store(self, source, key, array):
+        """Keep array for (source, key), evicting least recently used entries over budget"""
+        array.flags.writeable = False
+        if array.nbytes > self.budget_bytes:
+            return
+        entry = (id(source), key)
+        with self._lock:
+            ref = self._sources.get(entry[0])
+            if ref is None or ref() is not source:
+                self._sources[entry[0]] = weakref.ref(source, lambda _, s=entry[0]: self._forget(s))
+            if entry in self.entries:
+                self.nbytes -= self.entries[entry].nbytes
+            self.entries[entry] = array
+            self.nbytes += array.nbytes
+            while self.nbytes > self.budget_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+                self.evicted_bytes += evicted.nbytes
+
+    def _forget(self, source_id):
+        with self._lock:
+            self._sources.pop(source_id, None)
+            for entry in [entry for entry in self.entries if entry[0] == source_id]:
+                self.nbytes -= self.entries.pop(entry).nbytes
+
+    def invalidate(self, source):
+        """Drop everything computed from source, after it has been written to in place"""
+        self._forget(id(source))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._sources.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Counters for reporting: hits, misses, evictions, bytes held"""
+        with self._lock:
+            return {'entries': len(self.entries), 'bytes': self.nbytes,
+                    'budget': self.budget_bytes, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'evicted_bytes': self.evicted_bytes}
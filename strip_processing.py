@@ -0,0 +1,104 @@
+"""Strip-parallel execution of single stages on one frame.
+
+ExecutionPlan.run hands each stage to StripExecutor.run_stage, which cuts
+the frame into full-width horizontal strips and runs the stage on them on
+a thread pool (OpenCV and large numpy operations release the GIL). The
+strips are tiles in the sense of tiled_processing.py: each is read with
+the stage's halo above and below, so its rows come out exactly as from a
+whole-frame run, and stages that need a frame-wide statistic get it from
+a first parallel pass over the strips. Stages that cannot be tiled, and
+frames too small to be worth splitting, run whole.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tiled_processing import TileContext
+from derived_cache import derived_cache
+
+# Strips per thread, so uneven strips still keep every thread busy
+STRIPS_PER_THREAD = 2
+
+# Strips are never cut thinner than this, or the halos cost more than they save
+MIN_STRIP_ROWS = 64
+
+
+def split_rows(rows, threads, align=1):
+    """(top, bottom) row ranges of the strips to cut rows rows into for threads threads
+
+    Strip boundaries fall on multiples of align.
+    """
+    count = min(threads * STRIPS_PER_THREAD, rows // MIN_STRIP_ROWS)
+    if count <= 1:
+        return [(0, rows)]
+    height = -(-rows // count)
+    height = -(-height // align) * align
+    return [(top, min(top + height, rows)) for top in range(0, rows, height)]
+
+
+class StripExecutor:
+    def __init__(self, threads=None):
+        self.threads = threads or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+
+    def strips(self, rows, align=1):
+        """(top, bottom) row ranges of the strips for a frame of rows rows"""
+        return split_rows(rows, self.threads, align)
+
+    def run_stage(self, stage, image, out=None):
+        """Output of stage on image, computed strip by strip in parallel
+
+        out, if given, is an RGB uint8 frame the size of image to write into.
+        """
+        rows, cols = image.shape[:2]
+        # Pyramid-based stages need strips on their sampling grid (see FilterSpec.align)
+        strips = self.strips(rows, stage.align)
+        if self._pool is None or len(strips) == 1 or not stage.spec.tileable:
+            return stage.run(image, out)
+
+        halo = stage.halo
+        full_shape = (rows, cols)
+
+        def window(strip):
+            top, bottom = strip
+            start, stop = max(0, top - halo), min(rows, bottom + halo)
+            tile = image[start:stop]
+            if not stage.allocates:
+                # The windows overlap, so a stage writing in place needs its own copy
+                tile = tile.copy()
+            core = (slice(top - start, bottom - start), slice(0, cols))
+            return tile, TileContext(full_shape, (start, 0), core)
+
+        # The same windows and contexts serve both passes, so the statistic pass
+        # can leave work for the second in context.partial
+        windows = [window(strip) for strip in strips]
+        # Strips that are views of image (not copies) take their colour conversions
+        # from image's, so the conversion is cached for the whole frame
+        bands = [tile for tile, context in windows] if stage.allocates else []
+        for tile, context in windows[:len(bands)]:
+            derived_cache().add_band(tile, image, context.origin[0])
+        try:
+            stat = None
+            if stage.spec.global_stat is not None:
+                def partial(item):
+                    tile, context = item
+                    return stage.spec.global_stat(tile, stage.params, context)
+                for value in self._pool.map(partial, windows):
+                    stat = value if stat is None else np.maximum(stat, value)
+
+            result = out if out is not None else np.empty(full_shape + (3,), dtype=np.uint8)
+
+            def run(strip, item):
+                tile, context = item
+                context.stat = stat
+                result[strip[0]:strip[1]] = stage.run_tile(tile, context)[context.core]
+
+            # list() waits for every strip and re-raises the first error
+            list(self._pool.map(run, strips, windows))
+            return result
+        finally:
+            for tile in bands:
+                derived_cache().remove_band(tile)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,131 @@
+"""Tiled, out-of-core execution of compiled filter plans.
+
+The frame is streamed through the plan in tiles. Each tile is read with a
+halo as wide as the summed neighbourhood radii of the stages, so the core of
+every tile comes out exactly as if the whole frame had been filtered at once.
+Stages that depend on the whole frame (edge normalisation, the log transform
+peak) get their statistic from an earlier pass over the tiles. Results go to
+a memory-mapped .npy file, so neither input nor output has to fit in RAM.
+"""
+import os
+import math
+from functools import reduce
+import cv2
+import numpy as np
+
+# Edge length of the square tile cores, in pixels
+DEFAULT_TILE_SIZE = 1024
+
+
+class TileContext:
+    """Where a tile sits in the frame, plus the frame-wide statistic for the current stage"""
+    def __init__(self, full_shape, origin, core, stat=None):
+        # (rows, cols) of the whole frame
+        self.full_shape = full_shape
+        # (y, x) of the tile's top-left corner (including halo) in the frame
+        self.origin = origin
+        # Slices selecting the tile's own pixels (without halo) from the tile
+        self.core = core
+        self.stat = stat
+        # Whatever global_stat kept for tile_func on the same tile, or None.
+        # StripExecutor reuses a context between its two passes; here each
+        # pass makes new ones, so tile_func must not rely on it
+        self.partial = None
+
+    def core_of(self, image):
+        return image[self.core]
+
+
+def open_image(path):
+    """Open an RGB frame for tiled processing
+
+    .npy files are memory-mapped and never read in full. Other formats are
+    decoded by OpenCV, which needs the whole image in memory once.
+    """
+    if os.path.splitext(path)[1].lower() == '.npy':
+        return np.load(path, mmap_mode='r')
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not load image from path: {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+class TiledExecutor:
+    """Runs a plan tile by tile; tile_size is rounded up to the alignment the stages need"""
+    def __init__(self, plan, tile_size=DEFAULT_TILE_SIZE):
+        for stage in plan.stages:
+            if not stage.spec.tileable:
+                raise ValueError(f"Filter {stage.name} cannot be run tiled")
+        self.plan = plan
+        # Every tile window must start on a multiple of each stage's align, so
+        # both the tile size and the halo are rounded up to a common multiple
+        # (math.lcm takes several arguments only from Python 3.9)
+        self.align = reduce(lambda a, b: a * b // math.gcd(a, b), (stage.align for stage in plan.stages), 1)
+        self.tile_size = -(-tile_size // self.align) * self.align
+        # Halo needed around a tile core for every stage to be exact there
+        halo = sum(stage.halo for stage in plan.stages)
+        self.halo = -(-halo // self.align) * self.align
+
+    def tiles(self, full_shape):
+        """Yield (origin, padded window, core slices) for every tile"""
+        rows, cols = full_shape
+        for y in range(0, rows, self.tile_size):
+            for x in range(0, cols, self.tile_size):
+                y0, x0 = max(0, y - self.halo), max(0, x - self.halo)
+                y1 = min(rows, y + self.tile_size + self.halo)
+                x1 = min(cols, x + self.tile_size + self.halo)
+                core = (slice(y - y0, min(y + self.tile_size, rows) - y0),
+                        slice(x - x0, min(x + self.tile_size, cols) - x0))
+                yield (y0, x0), (slice(y0, y1), slice(x0, x1)), core
+
+    def run(self, image, output=None):
+        """Filter image tile by tile into output
+
+        output may be a path (a .npy memmap is created there), an existing
+        array of the right shape, or None for an in-memory result.
+        """
+        full_shape = image.shape[:2]
+        stats = [None] * len(self.plan.stages)
+
+        # First passes: one per stage that needs a frame-wide statistic
+        for index, stage in enumerate(self.plan.stages):
+            if stage.spec.global_stat is None:
+                continue
+            merged = None
+            for origin, window, core in self.tiles(full_shape):
+                tile = np.ascontiguousarray(image[window])
+                tile = self._run_stages(tile, full_shape, origin, core, stats, index)
+                context = TileContext(full_shape, origin, core)
+                partial = stage.spec.global_stat(tile, stage.params, context)
+                merged = partial if merged is None else np.maximum(merged, partial)
+            stats[index] = merged
+
+        if output is None:
+            output = np.empty(image.shape[:2] + (3,), dtype=np.uint8)
+        elif isinstance(output, str):
+            output = np.lib.format.open_memmap(output, mode='w+', dtype=np.uint8,
+                                               shape=image.shape[:2] + (3,))
+
+        # Final pass: run every stage and keep each tile's core
+        for origin, window, core in self.tiles(full_shape):
+            tile = np.ascontiguousarray(image[window])
+            tile = self._run_stages(tile, full_shape, origin, core, stats, len(self.plan.stages))
+            y0, x0 = origin
+            output[y0 + core[0].start:y0 + core[0].stop, x0 + core[1].start:x0 + core[1].stop] = tile[core]
+
+        if isinstance(output, np.memmap):
+            output.flush()
+        return output
+
+    def _run_stages(self, tile, full_shape, origin, core, stats, count):
+        """Run the first count stages on one padded tile"""
+        for index in range(count):
+            context = TileContext(full_shape, origin, core, stats[index])
+            tile = self.plan.stages[index].run_tile(tile, context)
+        return tile
+
+
+def process_file(input_path, output_path, pipeline, tile_size=DEFAULT_TILE_SIZE):
+    """Filter a large image file with pipeline into a memory-mapped .npy at output_path"""
+    executor = TiledExecutor(pipeline.compile(), tile_size)
+    return executor.run(open_image(input_path), output_path)
@@ -0,0 +1,53 @@
+"""Vignette masks applied without building the full mask.
+
+The vignette mask is the outer product of two 1-D Gaussian profiles scaled
+to a peak of 1, so a power of the mask is the outer product of the powered
+profiles. The profiles are cached by (length, power), and the image is
+multiplied a strip of rows at a time, so at most a strip-sized float32 mask
+exists at once, never an HxW (let alone HxWx3) float64 one.
+"""
+from functools import lru_cache
+import cv2
+import numpy as np
+
+# Rows multiplied per strip
+STRIP_ROWS = 256
+
+
+@lru_cache(maxsize=32)
+def vignette_profile(length, power):
+    """1-D Gaussian falloff over length pixels, peak 1, raised to power (read-only float32)"""
+    kernel = cv2.getGaussianKernel(length, length / 2)[:, 0]
+    profile = ((kernel / kernel.max()) ** power).astype(np.float32)
+    profile.flags.writeable = False
+    return profile
+
+
+def apply_vignette(image, power, full_shape=None, origin=(0, 0), blur=False, out=None):
+    """Multiply image by the vignette mask raised to power, truncating to uint8
+
+    full_shape and origin place image as a window of a larger frame, so a
+    tile gets the part of the whole frame's mask that covers it. With
+    blur=True the masked image gets a 3x3 Gaussian blur before truncation,
+    as in the vintage filter. The result goes into out if given.
+    """
+    rows, cols = image.shape[:2]
+    if full_shape is None:
+        full_shape = (rows, cols)
+    y0, x0 = origin
+    profile_y = vignette_profile(full_shape[0], power)[y0:y0 + rows]
+    profile_x = vignette_profile(full_shape[1], power)[x0:x0 + cols]
+
+    # Blurring needs one row of context on either side of each strip
+    halo = 1 if blur else 0
+    result = out if out is not None else np.empty(image.shape[:2] + (3,), dtype=np.uint8)
+    for top in range(0, rows, STRIP_ROWS):
+        bottom = min(top + STRIP_ROWS, rows)
+        start, stop = max(0, top - halo), min(rows, bottom + halo)
+        mask = profile_y[start:stop, np.newaxis] * profile_x
+        strip = image[start:stop] * mask[:, :, np.newaxis]
+        if blur:
+            strip = cv2.GaussianBlur(strip, (3, 3), 0)
+        # Assigning floats to the uint8 result truncates, like astype
+        result[top:bottom] = strip[top - start:top - start + bottom - top]
+    return result